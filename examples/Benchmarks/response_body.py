@@ -0,0 +1,52 @@
+#!/usr/bin/env python
+#
+# Measures what pretty-printing the raw response body costs next to parsing
+# a page of location history.  The client used to pretty-print every
+# response; it now does so only when response_body() is called.
+#
+# No Locomatix account is needed, the pages are generated locally.
+
+import sys
+import time
+import locomatix
+from locomatix.response_handlers import GetLocationHistoryResponseHandler
+
+try: import simplejson as json
+except ImportError: import json
+
+PAGE_SIZES = [100, 1000, 5000]
+REPEAT = 20
+
+def make_page(nrows):
+  objects = []
+  for i in range(nrows):
+    objects.append({ 'Latitude': 37.4 + i * 1e-5, 'Longitude': -122.1 - i * 1e-5, \
+                     'Time': 1300000000 + i, 'LocationNameValues': [{'speed': str(i % 80)}] })
+  page = { 'Status': 'Success', 'ExecutionTime': '1.0', \
+           'Result': { 'Objects': objects, 'NextKey': 'next' } }
+  return json.dumps(page)
+
+def timed(fn, arg):
+  start = time.time()
+  for i in range(REPEAT):
+    fn(arg)
+  return (time.time() - start) * 1000 / REPEAT
+
+def parse(text):
+  GetLocationHistoryResponseHandler().handle(json.loads(text))
+
+def pretty_print(body):
+  # what response_body() does with the decoded body kept by the client
+  json.dumps(body, indent=4)
+
+if __name__ == '__main__':
+
+  # parsing is the decode and handler work every page pays; the last column
+  # is the share of parsing plus response_body() that a lazy body saves
+  print '%8s %12s %22s %16s' % ('rows', 'parse (ms)', 'response_body() (ms)', 'saved per page')
+  for nrows in PAGE_SIZES:
+    text = make_page(nrows)
+    parsing = timed(parse, text)
+    printing = timed(pretty_print, json.loads(text))
+    print '%8d %12.2f %22.2f %15.0f%%' % \
+      (nrows, parsing, printing, 100 * printing / (parsing + printing))
@@ -0,0 +1,87 @@
+#!/usr/bin/env python
+#
+# Measures the memory taken by the records of a location history (trail)
+# pull and of a search page.  Result objects used to carry a __dict__ and
+# fresh name-value dicts each; they now use __slots__ and only allocate a
+# name-value dict when it is first used.
+#
+# No Locomatix account is needed, the pages are generated locally.
+
+import sys
+import locomatix
+from locomatix.response_handlers import GetLocationHistoryResponseHandler, SearchResponseHandler
+
+NROWS = 100000
+
+class DictLocation(object):
+  """The layout LxLocation had before it was slotted."""
+  def __init__(self):
+    self.longitude = None
+    self.latitude = None
+    self.time = None
+    self.lname_values = dict()
+
+class DictObjectLocation(object):
+  """The layout LxObjectLocation had before it was slotted."""
+  def __init__(self):
+    self.objectid = None
+    self.feed = None
+    self.name_values = dict()
+
+    self.longitude = None
+    self.latitude = None
+    self.time = None
+    self.lname_values = dict()
+
+def make_page(nrows, objects=True):
+  rows = []
+  for i in range(nrows):
+    row = { 'Latitude': 37.4 + i * 1e-5, 'Longitude': -122.1 - i * 1e-5, 'Time': 1300000000 + i }
+    if objects:
+      row.update({ 'Feed': 'cars', 'ObjectID': 'car%d' % (i % 1000) })
+    rows.append(row)
+  return { 'Status': 'Success', 'ExecutionTime': '1.0', 'Result': { 'Objects': rows } }
+
+def sizeof(records):
+  # count every object once, strings and numbers are the same either way;
+  # the slots are read directly so that no name-value dict gets allocated
+  seen = set()
+  total = 0
+  for record in records:
+    parts = [record, getattr(record, '__dict__', None)]
+    for name in ('name_values', 'lname_values'):
+      parts.append(getattr(record, '__dict__', {}).get(name))
+      parts.append(getattr(record, '_' + name, None))
+    for part in parts:
+      if part is None or id(part) in seen:
+        continue
+      seen.add(id(part))
+      total += sys.getsizeof(part)
+  return total
+
+def as_dict_records(records, cls):
+  converted = []
+  for record in records:
+    old = cls()
+    for name in ('objectid', 'feed', 'longitude', 'latitude', 'time'):
+      if hasattr(old, name):
+        setattr(old, name, getattr(record, name))
+    converted.append(old)
+  return converted
+
+def report(title, records, cls):
+  before = sizeof(as_dict_records(records, cls))
+  after = sizeof(records)
+  print '%s, %d records' % (title, len(records))
+  print '  before: %6.1f bytes per record' % (float(before) / len(records))
+  print '  after:  %6.1f bytes per record' % (float(after) / len(records))
+
+if __name__ == '__main__':
+
+  handler = GetLocationHistoryResponseHandler()
+  handler.handle(make_page(NROWS, objects=False))
+  report('location history', handler.locations, DictLocation)
+
+  handler = SearchResponseHandler()
+  handler.handle(make_page(NROWS))
+  report('search page', list(handler.objlocs), DictObjectLocation)
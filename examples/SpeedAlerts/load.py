@@ -1,7 +1,7 @@
 #!/usr/bin/env python
 
+import os
 import sys
-import time
 import locomatix
 
 LOCOMATIX_CUSTID = '<enter your locomatix custid>'
@@ -10,54 +10,45 @@ LOCOMATIX_SECRET_KEY = '<enter your locomatix secret key>'
 
 SPEEDTRAPS_DATA_FILE = 'speedtraps.data'
 FEED_SPEEDTRAPS = 'speedtraps'
+SPEEDTRAPS_CHECKPOINT_FILE = 'speedtraps.checkpoint'
+SPEEDTRAPS_FIELDS = ['objectid', 'latitude', 'longitude', \
+                     'SpeedLimit', 'Type', 'City', 'State', 'Comments']
+LOADER_WORKERS = 8
 
 class SpeedTraps(object):
 
   def setUp(self):
 
-    # First create a Locomatix client with the credentials
+    # First create a Locomatix client with the credentials, with a
+    # connection for every object created at the same time
     self.conn = locomatix.Client(LOCOMATIX_CUSTID,
                                  LOCOMATIX_KEY,
-                                 LOCOMATIX_SECRET_KEY)
+                                 LOCOMATIX_SECRET_KEY,
+                                 pool_size=LOADER_WORKERS)
 
   def tearDown(self):
     self.conn.close() 
 
   def load(self):
 
-    # Open the data speed trap file
-    try:
-      handle = open(SPEEDTRAPS_DATA_FILE, 'r')
-
-    # If there are any errors, spit it and exit
-    except IOError :
+    # Make sure the data speed trap file is there
+    if not os.path.exists(SPEEDTRAPS_DATA_FILE):
       print "Error opening data file %s" % (SPEEDTRAPS_DATA_FILE)
       sys.exit(1)
 
-    # Now read the data file 
-    igot = handle.readlines()
-    for line in igot:
-      data = line.rstrip().split(',')
-      if data == [] or len(data) < 8:
-        continue
-
-      cid = data[0]
-      latitude = data[1]
-      longitude = data[2]
-      nvpairs = { 
-        'SpeedLimit' : data[3], 'Type' :  data[4],
-        'City' : data[5], 'State' : data[6], 'Comments' : data[7]
-      }
-
-      location = locomatix.Point(latitude, longitude)
-
-      try:
-        self.conn.create_object(cid, FEED_SPEEDTRAPS, nvpairs, location, time.time());
-
-      # Make sure that we have created the object successfully
-      except locomatix.LxException, ex:
-        print 'unable to create object %s in feed %s - %s' % \
-          (cid, FEED_SPEEDTRAPS, ex.message)
+    # Report the speed traps that could not be created
+    def on_error(record, ex):
+      print 'unable to create object %s in feed %s - %s' % \
+        (record['objectid'], FEED_SPEEDTRAPS, ex.message)
+
+    # Now create the speed traps, several at a time.  An interrupted load
+    # resumes from the checkpoint when run again
+    loader = locomatix.BulkLoader(self.conn, FEED_SPEEDTRAPS, LOADER_WORKERS, \
+                                  checkpoint=SPEEDTRAPS_CHECKPOINT_FILE, on_error=on_error)
+    records = locomatix.bulk.read_csv(SPEEDTRAPS_DATA_FILE, SPEEDTRAPS_FIELDS)
+    stats = loader.load(records)
+    print 'created %d speed traps (%d existed) at %.1f objects/s' % \
+      (stats['created'], stats['existing'], stats['rate'])
 
 if __name__ == '__main__':
 
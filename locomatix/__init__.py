@@ -15,12 +15,22 @@
 # limitations under the License.
 #
 ###############################################################################
-__all__ = ['argsparser', 'client','requests','responses', 'keys', \
+__all__ = ['argsparser', 'client', 'pool', 'async_client', 'futures', 'batch', 'filters', 'adaptive', 'mirror', 'cache', 'bulk', 'retry', 'breaker', 'outbox', 'stream', 'requests','responses', 'keys', \
            'region', 'callback', 'response_handlers','cli', 'exceptions', \
            'objects', 'response_objects']
 
 from argsparser import ArgsParser
 from client import Client
+from async_client import AsyncClient
+from futures import LxFuture, CancelledError
+from batch import LocationBatcher
+from filters import LocationFilter
+from adaptive import AdaptiveFetchSize
+from mirror import FeedMirror
+from bulk import BulkLoader
+from retry import RetryPolicy
+from breaker import CircuitBreaker
+from outbox import Outbox
 from objects import *
 from region import *
 from callback import *
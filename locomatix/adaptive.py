@@ -0,0 +1,92 @@
+###############################################################################
+#
+# Copyright 2010 Locomatix, Inc.
+# 
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+# 
+#     http://www.apache.org/licenses/LICENSE-2.0
+# 
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+###############################################################################
+import threading
+from defaults import *
+
+class AdaptiveFetchSize(object):
+  """A fetch size that adapts to what the server tolerates.
+
+  Pass an instance, or the string 'adaptive', as fetch_size to a paginated
+  Client method.  After every batch the size is scaled towards the largest
+  batch that comes back within latency_budget seconds and max_bytes bytes,
+  by at most a factor of two per batch.  A TooBigFetch error caps the size
+  below the rejected one from then on and the batch is retried half way
+  between the largest size known to work and the rejected one.
+  An instance may be shared by several requests and threads, so that what it
+  learned carries over."""
+
+  def __init__(self, initial=DEFAULT_FETCH_SIZE, \
+                     min_size=DEFAULT_ADAPTIVE_MIN_FETCH_SIZE, \
+                     max_size=DEFAULT_ADAPTIVE_MAX_FETCH_SIZE, \
+                     latency_budget=DEFAULT_ADAPTIVE_LATENCY_BUDGET, \
+                     max_bytes=DEFAULT_ADAPTIVE_MAX_BYTES):
+    """
+    Args:
+      initial: fetch size of the first batch
+      min_size: smallest fetch size used
+      max_size: largest fetch size used
+      latency_budget: seconds a batch may take, network and server included
+      max_bytes: size in bytes a batch may have, optional"""
+    if min_size < 1 or max_size < min_size:
+      raise ValueError("fetch sizes must satisfy 1 <= min_size <= max_size")
+    self._min_size = min_size
+    self._max_size = max_size
+    self._ceiling = max_size   # largest size not known to be rejected
+    self._accepted = 0         # largest size known to work
+    self._latency_budget = latency_budget
+    self._max_bytes = max_bytes
+    self._size = max(min_size, min(max_size, initial))
+    self._lock = threading.Lock()
+
+  def size(self):
+    """Returns the fetch size to use for the next batch."""
+    return self._size
+
+  def observe(self, size, elapsed, nbytes, nrows):
+    """Scales the fetch size after a batch of nrows rows fetched with size."""
+    self._lock.acquire()
+    try:
+      self._accepted = max(self._accepted, min(size, self._ceiling))
+      if nrows < size and elapsed <= self._latency_budget:
+        return # a short last batch says nothing about larger ones
+      scale = 2.0
+      if elapsed > 0:
+        scale = min(scale, self._latency_budget / elapsed)
+      if self._max_bytes and nbytes > 0:
+        scale = min(scale, float(self._max_bytes) / nbytes)
+      scale = max(0.5, scale)
+      target = int(size * scale)
+      self._size = max(self._min_size, min(self._ceiling, target))
+    finally:
+      self._lock.release()
+
+  def too_big(self, size):
+    """Records that the server rejected a batch of the given size."""
+    self._lock.acquire()
+    try:
+      self._ceiling = max(self._min_size, min(self._ceiling, size - 1))
+      if self._accepted < size:
+        retry = (self._accepted + size) // 2
+      else:
+        # the server has become stricter, forget what used to work
+        self._accepted = 0
+        retry = size // 2
+      self._size = max(self._min_size, min(self._ceiling, retry))
+    finally:
+      self._lock.release()
+    return size > self._min_size
@@ -0,0 +1,107 @@
+###############################################################################
+#
+# Copyright 2010 Locomatix, Inc.
+# 
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+# 
+#     http://www.apache.org/licenses/LICENSE-2.0
+# 
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+###############################################################################
+from client import Client
+from defaults import *
+from futures import WorkerPool, BackgroundIterator
+
+# Client methods that issue a single request and return its result
+SINGLE_REQUESTS = [
+  'create_feed', 'delete_feed',
+  'create_object', 'create_object_location', 'create_object_locations', 'delete_object',
+  'update_attributes', 'get_attributes', 'update_location', 'get_location', 'get_locations',
+  'create_zone', 'create_smart_zone', 'activate_zone', 'get_zone',
+  'deactivate_zone', 'delete_zone',
+  'create_fence', 'create_smart_fence', 'activate_fence', 'get_fence',
+  'deactivate_fence', 'delete_fence',
+  'get_histogram', 'query_histogram',
+]
+
+# Client methods that walk a paginated result set
+PAGED_REQUESTS = [
+  'list_feeds', 'list_objects', 'query_objects',
+  'search_nearby', 'query_search_nearby', 'search_region', 'query_search_region',
+  'list_zones', 'list_fences',
+  'get_location_history', 'query_location_history',
+  'get_space_activity', 'query_space_activity',
+]
+
+class AsyncClient(object):
+  """A non-blocking counterpart of Client.
+
+  Every Client method that issues a single request returns an LxFuture right
+  away; the request runs on one of a fixed number of worker threads that share
+  a pool of persistent connections.  Paginated methods return an iterator that
+  fetches pages on a background thread while the caller consumes the previous
+  ones.  Requests are built and responses parsed by the same Client code, so
+  results and exceptions are exactly those of the blocking Client."""
+
+  def __init__(self, custid, custkey, secretkey, \
+                    host = DEFAULT_LOCOMATIX_HOST, \
+                    port = None, version = DEFAULT_LOCOMATIX_VERSION, \
+                    timeout=10, retry=3, workers=DEFAULT_ASYNC_WORKERS, \
+                    max_buffered=DEFAULT_ASYNC_MAX_BUFFERED):
+    """
+    Args:
+      custid:    customer ID, required
+      custkey:   customer Key, required
+      secretkey: customer secret key, required
+      host:      Locomatix Server hostname, required
+      port:      Locomatix Server port, required
+      version:   Locomatix API version, required (currently 0.9)
+      timeout:   Locomatix server connection timeout
+      retry:     No. of retries while connecting to Locomatix service
+      workers:   No. of requests in flight at the same time
+      max_buffered: No. of results a paginated iterator reads ahead"""
+    self._client = Client(custid, custkey, secretkey, host, port, version, \
+                          timeout, retry, pool_size=workers)
+    self._workers = WorkerPool(workers)
+    self._max_buffered = max_buffered
+
+  def close(self):
+    """Waits for the outstanding requests and closes all connections."""
+    self._workers.shutdown()
+    self._client.close()
+
+  def client(self):
+    """Returns the underlying blocking Client."""
+    return self._client
+
+  def submit(self, fn, *args, **kwargs):
+    """Runs fn(client, *args, **kwargs) on a worker, returning an LxFuture."""
+    return self._workers.submit(fn, self._client, *args, **kwargs)
+
+def _single_request(name):
+  def method(self, *args, **kwargs):
+    return self._workers.submit(getattr(self._client, name), *args, **kwargs)
+  method.__name__ = name
+  method.__doc__ = "Runs Client.%s in the background and returns an LxFuture." % name
+  return method
+
+def _paged_request(name):
+  def method(self, *args, **kwargs):
+    results = getattr(self._client, name)(*args, **kwargs)
+    return BackgroundIterator(results, self._max_buffered)
+  method.__name__ = name
+  method.__doc__ = "Iterates Client.%s while fetching further pages in the background." % name
+  return method
+
+for name in SINGLE_REQUESTS:
+  setattr(AsyncClient, name, _single_request(name))
+
+for name in PAGED_REQUESTS:
+  setattr(AsyncClient, name, _paged_request(name))
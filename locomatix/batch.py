@@ -0,0 +1,247 @@
+###############################################################################
+#
+# Copyright 2010 Locomatix, Inc.
+# 
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+# 
+#     http://www.apache.org/licenses/LICENSE-2.0
+# 
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+###############################################################################
+import logging
+import threading
+from time import time as current_time
+from defaults import *
+from futures import WorkerPool
+from cache import LRUCache
+
+log = logging.getLogger('locomatix')
+
+class LocationBatcher(object):
+  """Buffers location updates and ships them in the background.
+
+  Updates handed to add() are queued and flushed once batch_size of them are
+  waiting or the oldest one has waited max_latency seconds, whichever comes
+  first.  A flushed batch is sent by a number of sender threads at once, so
+  the client should have at least as many pooled connections as senders.
+  The updates of one object always go through the same sender, so they
+  reach the server in the order they were added.
+  At most max_pending updates are buffered or in flight; add() blocks beyond
+  that.  A failed update does not stop the stream: it is passed, with the
+  exception raised by the client, to on_error(update, exception), where
+  update is the (objectid, feed, location, time, name_values) tuple.
+
+  With coalesce set, an update replaces the one still waiting for the same
+  (feed, objectid), so that only the newest position of a chatty object is
+  sent.  keep_every=N additionally sends every Nth update of an object as
+  it is, to retain some density in the location history.  The updates of
+  at most max_tracked objects are counted for it; an object evicted from
+  that count, or quiet for DEFAULT_BATCH_TRACKED_TTL seconds, starts over."""
+
+  def __init__(self, client, batch_size=DEFAULT_BATCH_SIZE, \
+                     max_latency=DEFAULT_BATCH_MAX_LATENCY, \
+                     max_pending=DEFAULT_BATCH_MAX_PENDING, \
+                     senders=DEFAULT_BATCH_SENDERS, on_error=None, \
+                     coalesce=False, keep_every=0, \
+                     max_tracked=DEFAULT_BATCH_MAX_TRACKED):
+    """
+    Args:
+      client: Client used to send the updates, required
+      batch_size: No. of updates that triggers a flush
+      max_latency: Seconds an update may wait before it is flushed
+      max_pending: No. of updates buffered or in flight before add() blocks
+      senders: No. of updates sent concurrently
+      on_error: called with (update, exception) for every failed update
+      coalesce: send only the newest waiting update of each object
+      keep_every: with coalesce, never collapse every Nth update of an object
+      max_tracked: No. of objects whose updates are counted for keep_every"""
+    if batch_size < 1 or max_pending < batch_size:
+      raise ValueError("max_pending must be at least batch_size, which must be positive")
+    if senders < 1:
+      raise ValueError("a batcher needs at least one sender")
+    self._client = client
+    self._batch_size = batch_size
+    self._max_latency = max_latency
+    self._max_pending = max_pending
+    self._on_error = on_error
+    self._coalesce = coalesce
+    self._keep_every = keep_every
+    self._cond = threading.Condition()
+    self._buffer = []       # [update, arrival time] lists, so updates can be replaced
+    self._latest = dict()   # (feed, objectid) -> buffer slot that may be replaced
+    self._received = None   # (feed, objectid) -> No. of updates, for keep_every
+    if keep_every > 0:
+      self._received = LRUCache(max_tracked, DEFAULT_BATCH_TRACKED_TTL)
+    self._inflight = 0
+    self._flushing = False
+    self._closed = False
+    self.sent = 0
+    self.failed = 0
+    self.collapsed = 0
+    # one thread per pool, so that each sender keeps its updates in order
+    self._senders = [WorkerPool(1) for i in range(senders)]
+    self._flusher = threading.Thread(target=self._run)
+    self._flusher.setDaemon(True)
+    self._flusher.start()
+
+  def add(self, objectid, feed, location, time, name_values={}):
+    """Queues a location update, blocking while max_pending updates are waiting."""
+    self._enqueue((objectid, feed, location, time, name_values))
+
+  def pending(self):
+    """Returns the number of updates buffered or in flight."""
+    self._cond.acquire()
+    try:
+      return len(self._buffer) + self._inflight
+    finally:
+      self._cond.release()
+
+  def stats(self):
+    """Returns a dictionary of counters describing the batcher."""
+    return { 'pending' : self.pending(), 'sent' : self.sent, \
+             'failed' : self.failed, 'collapsed' : self.collapsed }
+
+  def flush(self):
+    """Sends everything buffered so far and waits until it has been sent."""
+    self._cond.acquire()
+    try:
+      self._flushing = True
+      self._cond.notifyAll()
+      while len(self._buffer) > 0 or self._inflight > 0:
+        self._cond.wait()
+    finally:
+      self._cond.release()
+
+  def close(self):
+    """Flushes the remaining updates and stops the background threads."""
+    self.flush()
+    self._cond.acquire()
+    try:
+      self._closed = True
+      self._cond.notifyAll()
+    finally:
+      self._cond.release()
+    self._flusher.join()
+    for sender in self._senders:
+      sender.shutdown()
+
+  def _enqueue(self, update):
+    self._cond.acquire()
+    try:
+      if self._closed:
+        raise ValueError("the batcher has been closed")
+      if self._coalesce and self._replace(update):
+        return
+      while len(self._buffer) + self._inflight >= self._max_pending and not self._closed:
+        self._cond.wait()
+      if self._closed:
+        raise ValueError("the batcher has been closed")
+      slot = [update, current_time()]
+      self._buffer.append(slot)
+      if self._coalesce and not self._pinned(update):
+        self._latest[(update[1], update[0])] = slot
+      if len(self._buffer) >= self._batch_size:
+        self._cond.notifyAll()
+    finally:
+      self._cond.release()
+
+  def _pinned(self, update):
+    """Counts the update and tells whether keep_every protects it."""
+    if self._keep_every < 1:
+      return False
+    key = (update[1], update[0])
+    count = (self._received.get(key, 0) + 1) % self._keep_every
+    self._received.put(key, count)
+    return count == 0
+
+  def _replace(self, update):
+    """Folds the update into a waiting one of the same object, if any."""
+    key = (update[1], update[0])
+    slot = self._latest.get(key)
+    if slot is None:
+      return False
+    if self._keep_every > 0 and self._received.get(key, 0) + 1 == self._keep_every:
+      # this one is kept - it gets a slot of its own
+      del self._latest[key]
+      return False
+    self._pinned(update)
+    if update[3] >= slot[0][3]:
+      slot[0] = update
+    self.collapsed += 1
+    return True
+
+  def _next_batch(self):
+    """Waits until a flush is due and takes the batch off the buffer."""
+    self._cond.acquire()
+    try:
+      while True:
+        if len(self._buffer) == 0:
+          self._flushing = False
+          if self._closed:
+            return None
+          self._cond.wait()
+          continue
+        # a replaced update keeps the arrival time of the one it replaced
+        waited = current_time() - self._buffer[0][1]
+        if self._flushing or self._closed or waited >= self._max_latency or \
+           len(self._buffer) >= self._batch_size:
+          break
+        self._cond.wait(self._max_latency - waited)
+
+      batch = [slot[0] for slot in self._buffer[:self._batch_size]]
+      for slot in self._buffer[:self._batch_size]:
+        key = (slot[0][1], slot[0][0])
+        if self._latest.get(key) is slot:
+          del self._latest[key]
+      del self._buffer[:self._batch_size]
+      self._inflight += len(batch)
+      return batch
+    finally:
+      self._cond.release()
+
+  def _run(self):
+    while True:
+      batch = self._next_batch()
+      if batch is None:
+        return
+      for update in batch:
+        sender = self._senders[hash((update[1], update[0])) % len(self._senders)]
+        sender.submit(self._send, update)
+
+  def _send(self, update):
+    objectid, feed, location, time, name_values = update
+    try:
+      self._client.update_location(objectid, feed, location, time, name_values)
+    except Exception, ex:
+      self._report(update, ex)
+      self._done(False)
+    else:
+      self._done(True)
+
+  def _done(self, success):
+    self._cond.acquire()
+    try:
+      if success:
+        self.sent += 1
+      else:
+        self.failed += 1
+      self._inflight -= 1
+      self._cond.notifyAll()
+    finally:
+      self._cond.release()
+
+  def _report(self, update, ex):
+    if self._on_error is None:
+      log.warning("update_location of %s in feed %s failed - %s" % (update[0], update[1], ex))
+      return
+    try:
+      self._on_error(update, ex)
+    except Exception:
+      log.exception("on_error callback failed")
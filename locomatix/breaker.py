@@ -0,0 +1,144 @@
+###############################################################################
+#
+# Copyright 2010 Locomatix, Inc.
+# 
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+# 
+#     http://www.apache.org/licenses/LICENSE-2.0
+# 
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+###############################################################################
+import logging
+import threading
+import time
+from defaults import *
+from exceptions import *
+
+log = logging.getLogger('locomatix')
+
+CLOSED, OPEN, HALF_OPEN = 'closed', 'open', 'half-open'
+
+class CircuitBreaker(object):
+  """Stops sending requests to a server that keeps failing.
+
+  The breaker watches the outcome of the last window attempts.  Once at
+  least min_requests of them are known and failure_rate of them failed, it
+  opens: every request fails at once with CircuitOpen instead of waiting on a
+  degraded server.  After reset_timeout seconds it turns half-open and lets
+  trials requests through; if they all succeed it closes again, if any fails
+  it opens for another reset_timeout.
+
+  Only failures of the service count: connection problems, lost responses,
+  InternalSystemError and HTTP 5xx.  on_change(old_state, new_state), if
+  given, is called on every change of state, e.g. to divert writes to a
+  local buffer while the breaker is open.  A breaker may be shared by
+  several clients of the same server."""
+
+  def __init__(self, failure_rate=DEFAULT_BREAKER_FAILURE_RATE, \
+                     window=DEFAULT_BREAKER_WINDOW, \
+                     min_requests=DEFAULT_BREAKER_MIN_REQUESTS, \
+                     reset_timeout=DEFAULT_BREAKER_RESET_TIMEOUT, \
+                     trials=DEFAULT_BREAKER_TRIALS, on_change=None):
+    """
+    Args:
+      failure_rate: fraction of failed attempts that opens the breaker
+      window: No. of recent attempts the failure rate is computed over
+      min_requests: No. of attempts needed before the breaker may open
+      reset_timeout: Seconds the breaker stays open before trying again
+      trials: No. of requests let through while half-open
+      on_change: called with (old_state, new_state) on every change"""
+    if min_requests > window:
+      raise ValueError("min_requests must not exceed window")
+    self._failure_rate = failure_rate
+    self._window = window
+    self._min_requests = min_requests
+    self._reset_timeout = reset_timeout
+    self._trials = trials
+    self._on_change = on_change
+    self._lock = threading.Lock()
+    self._state = CLOSED
+    self._outcomes = []     # True for every failure among the recent attempts
+    self._failures = 0      # failures in _outcomes
+    self._opened_at = None
+    self._trials_started = 0
+    self._trials_passed = 0
+
+  def state(self):
+    """Returns 'closed', 'open' or 'half-open'."""
+    self._lock.acquire()
+    try:
+      if self._state == OPEN and time.time() - self._opened_at >= self._reset_timeout:
+        return HALF_OPEN
+      return self._state
+    finally:
+      self._lock.release()
+
+  def before(self):
+    """Raises CircuitOpen unless an attempt may be made now."""
+    change = None
+    self._lock.acquire()
+    try:
+      if self._state == OPEN:
+        waited = time.time() - self._opened_at
+        if waited < self._reset_timeout:
+          raise CircuitOpen(self._reset_timeout - waited)
+        change = self._set_state(HALF_OPEN)
+        self._trials_started = self._trials_passed = 0
+      if self._state == HALF_OPEN:
+        if self._trials_started >= self._trials:
+          raise CircuitOpen(0)
+        self._trials_started += 1
+    finally:
+      self._lock.release()
+    self._notify(change)
+
+  def after(self, failed):
+    """Records the outcome of an attempt allowed by before()."""
+    change = None
+    self._lock.acquire()
+    try:
+      if self._state == HALF_OPEN:
+        if failed:
+          change = self._open()
+        else:
+          self._trials_passed += 1
+          if self._trials_passed >= self._trials:
+            change = self._set_state(CLOSED)
+            self._outcomes, self._failures = [], 0
+      elif self._state == CLOSED:
+        self._outcomes.append(failed)
+        self._failures += failed
+        if len(self._outcomes) > self._window:
+          self._failures -= self._outcomes.pop(0)
+        if len(self._outcomes) >= self._min_requests and \
+           self._failures >= self._failure_rate * len(self._outcomes):
+          change = self._open()
+    finally:
+      self._lock.release()
+    self._notify(change)
+
+  def _open(self):
+    self._opened_at = time.time()
+    return self._set_state(OPEN)
+
+  def _set_state(self, state):
+    # callers hold the lock; returns the change to notify once it is released
+    old, self._state = self._state, state
+    return (old, state)
+
+  def _notify(self, change):
+    if change == None or change[0] == change[1]:
+      return
+    log.warning("circuit breaker %s -> %s" % change)
+    if self._on_change != None:
+      try:
+        self._on_change(change[0], change[1])
+      except Exception, ex:
+        log.warning("on_change callback failed - %s" % ex)
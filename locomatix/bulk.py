@@ -0,0 +1,237 @@
+###############################################################################
+#
+# Copyright 2010 Locomatix, Inc.
+# 
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+# 
+#     http://www.apache.org/licenses/LICENSE-2.0
+# 
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+###############################################################################
+import csv
+import logging
+import os
+import threading
+from time import time as current_time
+from defaults import *
+from exceptions import *
+from futures import WorkerPool
+from region import Point
+
+try: import simplejson as json
+except ImportError:
+  try: import json
+  except ImportError:
+    raise ImportError("simplejson is not installed. Please download it from http://code.google.com/p/simplejson/")
+
+log = logging.getLogger('locomatix')
+
+def read_csv(path, fieldnames=None):
+  """Yields the rows of a CSV file as dicts keyed by the header row, or by
+  fieldnames if the file has no header.  Fields beyond fieldnames are dropped."""
+  handle = open(path, 'rb')
+  try:
+    for row in csv.DictReader(handle, fieldnames, skipinitialspace=True):
+      row.pop(None, None)
+      yield row
+  finally:
+    handle.close()
+
+def read_ndjson(path):
+  """Yields the JSON object on every non-blank line of a file."""
+  handle = open(path, 'r')
+  try:
+    for line in handle:
+      line = line.strip()
+      if line:
+        yield json.loads(line)
+  finally:
+    handle.close()
+
+class BulkLoader(object):
+  """Creates the objects of a stream of records in a feed, several at a time.
+
+  A record is a dict with an 'objectid', optionally 'latitude', 'longitude'
+  and 'time' for the initial location (time defaults to now), and any other
+  non-empty fields as attributes; read_csv and read_ndjson produce such dicts.
+  The client should have at least as many pooled connections as workers.
+
+  An object that already exists counts as loaded, or with update_existing has
+  its attributes and location replaced by the record's.  Any other failure is
+  passed, with the exception, to on_error(record, exception) and the load goes
+  on.  With a checkpoint file the number of leading records that are done,
+  and which of them failed, is saved every checkpoint_every records; loading
+  the same records again retries the failed ones and resumes after the rest."""
+
+  def __init__(self, client, feed, workers=DEFAULT_BULK_WORKERS, checkpoint=None, \
+                     checkpoint_every=DEFAULT_BULK_CHECKPOINT_EVERY, \
+                     update_existing=False, on_error=None):
+    """
+    Args:
+      client: Client used to create the objects, required
+      feed: Feed name in which the objects are created, required
+      workers: No. of objects created concurrently
+      checkpoint: path of the file that records the progress, optional
+      checkpoint_every: No. of records between checkpoints
+      update_existing: update the objects that already exist
+      on_error: called with (record, exception) for every failed record"""
+    self._client = client
+    self._feed = feed
+    self._workers = workers
+    self._checkpoint = checkpoint
+    self._checkpoint_every = checkpoint_every
+    self._update_existing = update_existing
+    self._on_error = on_error
+    self._lock = threading.Lock()
+    self._finished = set()  # indices of the records done after _done
+    self._done = 0          # records before this index are all done
+    self._failed = set()    # indices of the records that failed
+    self._saved = 0         # _done at the last checkpoint
+    self._counts = { 'created': 0, 'existing': 0, 'updated': 0, 'failed': 0 }
+    self._start_time = None
+    self._reported = None
+
+  def load(self, records):
+    """Creates an object for every record, skipping those done before.
+
+    Return:
+      The stats() once every record is done"""
+    self._done, self._failed = self._read_checkpoint()
+    self._saved = self._done
+    self._finished.clear()
+    self._start_time = self._reported = current_time()
+    slots = threading.Semaphore(self._workers * 2)
+    pool = WorkerPool(self._workers)
+    try:
+      for index, record in enumerate(records):
+        if index < self._done and index not in self._failed:
+          continue
+        slots.acquire()
+        future = pool.submit(self._create, record)
+        future.add_done_callback(lambda future, index=index, record=record: \
+                                   self._finish(index, record, future, slots))
+    finally:
+      pool.shutdown()
+    self._lock.acquire()
+    try:
+      self._write_checkpoint()
+    finally:
+      self._lock.release()
+    return self.stats()
+
+  def stats(self):
+    """Returns the no. of records created, existing, updated and failed in the
+    current or last load, the seconds it took and the records done per second."""
+    self._lock.acquire()
+    try:
+      stats = dict(self._counts)
+    finally:
+      self._lock.release()
+    done = sum(stats.values())
+    elapsed = 0.0
+    if self._start_time != None:
+      elapsed = current_time() - self._start_time
+    stats['elapsed'] = elapsed
+    stats['rate'] = done / elapsed if elapsed > 0 else 0.0
+    return stats
+
+  def _create(self, record):
+    fields = dict(record)
+    objectid = fields.pop('objectid')
+    latitude = fields.pop('latitude', None)
+    longitude = fields.pop('longitude', None)
+    time = fields.pop('time', None)
+    name_values = dict((name, value) for name, value in fields.items() if value not in (None, ''))
+
+    location = None
+    if latitude not in (None, '') and longitude not in (None, ''):
+      location = Point(latitude, longitude)
+      if time in (None, ''):
+        time = int(current_time())
+
+    try:
+      self._client.create_object(objectid, self._feed, name_values, location, time or 0)
+      return 'created'
+    except ObjectAlreadyExists:
+      if not self._update_existing:
+        return 'existing'
+    self._client.update_attributes(objectid, self._feed, name_values)
+    if location != None:
+      self._client.update_location(objectid, self._feed, location, time)
+    return 'updated'
+
+  def _finish(self, index, record, future, slots):
+    try:
+      ex = future.exception()
+      self._lock.acquire()
+      try:
+        if ex != None:
+          self._counts['failed'] += 1
+          self._failed.add(index)
+        else:
+          self._counts[future.result()] += 1
+          self._failed.discard(index)
+        if index >= self._done:
+          self._finished.add(index)
+        while self._done in self._finished:
+          self._finished.remove(self._done)
+          self._done += 1
+        if self._done - self._saved >= self._checkpoint_every:
+          self._write_checkpoint()
+      finally:
+        self._lock.release()
+
+      if ex != None and self._on_error != None:
+        try:
+          self._on_error(record, ex)
+        except Exception, cbex:
+          log.warning("on_error callback failed - %s" % cbex)
+      self._report()
+    finally:
+      slots.release()
+
+  def _report(self):
+    now = current_time()
+    if now - self._reported < DEFAULT_BULK_REPORT_INTERVAL:
+      return
+    self._reported = now
+    stats = self.stats()
+    log.info("loaded %d records into feed %s, %.1f records/s, %d failed" % \
+               (self._done, self._feed, stats['rate'], stats['failed']))
+
+  def _read_checkpoint(self):
+    # the first line has the no. of leading records done, the second the
+    # indices of those that failed
+    if self._checkpoint == None or not os.path.exists(self._checkpoint):
+      return 0, set()
+    handle = open(self._checkpoint, 'r')
+    try:
+      lines = handle.read().split('\n')
+    finally:
+      handle.close()
+    done = int(lines[0].strip() or 0)
+    failed = set()
+    if len(lines) > 1:
+      failed = set([int(index) for index in lines[1].split()])
+    return done, failed
+
+  def _write_checkpoint(self):
+    # callers hold self._lock; rename so that a crash never leaves a torn file
+    if self._checkpoint == None:
+      return
+    partial = self._checkpoint + '.tmp'
+    handle = open(partial, 'w')
+    try:
+      failed = sorted([index for index in self._failed if index < self._done])
+      handle.write('%d\n%s\n' % (self._done, ' '.join([str(index) for index in failed])))
+    finally:
+      handle.close()
+    os.rename(partial, self._checkpoint)
+    self._saved = self._done
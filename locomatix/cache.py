@@ -0,0 +1,154 @@
+###############################################################################
+#
+# Copyright 2010 Locomatix, Inc.
+# 
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+# 
+#     http://www.apache.org/licenses/LICENSE-2.0
+# 
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+###############################################################################
+import threading
+import time
+
+class LRUCache(object):
+  """A thread-safe cache that holds at most max_entries entries, evicting the
+  least recently used one when full, and forgets every entry ttl seconds
+  after it was stored.
+
+  Entries are kept in a dict and chained in a circular doubly-linked list in
+  order of use, so that lookups, stores and evictions are all O(1).
+
+  To avoid storing a value read before a concurrent invalidation, readers take
+  version() before fetching and pass it to put(); the value is dropped if any
+  key was invalidated in between."""
+
+  # indices in a link of the list
+  PREV, NEXT, KEY, VALUE, EXPIRES = 0, 1, 2, 3, 4
+
+  def __init__(self, max_entries, ttl):
+    """
+    Args:
+      max_entries: maximum number of entries, required
+      ttl: seconds an entry stays valid, required"""
+    if max_entries < 1:
+      raise ValueError("max_entries must be at least 1")
+    self._max_entries = max_entries
+    self._ttl = ttl
+    self._links = dict()           # key -> link
+    self._root = []                # sentinel, root[NEXT] is the most recent
+    self._root[:] = [self._root, self._root, None, None, None]
+    self._version = 0
+    self._lock = threading.Lock()
+    self._hits = 0
+    self._misses = 0
+    self._evictions = 0
+    self._expirations = 0
+
+  def __len__(self):
+    return len(self._links)
+
+  def version(self):
+    """Returns a token that changes whenever an entry is invalidated."""
+    return self._version
+
+  def get(self, key, default=None):
+    """Returns the value stored for key, default if absent or expired."""
+    return self.get_any((key,), default)
+
+  def get_any(self, keys, default=None):
+    """Returns the value stored for the first of keys present, default if
+    none is.  Counts as a single hit or miss."""
+    self._lock.acquire()
+    try:
+      for key in keys:
+        link = self._links.get(key)
+        if link != None and link[self.EXPIRES] <= time.time():
+          self._unlink(link)
+          self._expirations += 1
+          link = None
+        if link != None:
+          self._hits += 1
+          self._unlink(link)
+          self._link(link)
+          return link[self.VALUE]
+      self._misses += 1
+      return default
+    finally:
+      self._lock.release()
+
+  def put(self, key, value, ttl=None, version=None):
+    """Stores value for key for ttl seconds, at most the cache's ttl.
+
+    Args:
+      key: a hashable key, required
+      value: the value to store, required
+      ttl: seconds the value stays valid, optional
+      version: the version() taken before value was read, optional"""
+    if ttl == None or ttl > self._ttl:
+      ttl = self._ttl
+    if ttl <= 0:
+      return
+    self._lock.acquire()
+    try:
+      if version != None and version != self._version:
+        return
+      link = self._links.get(key)
+      if link != None:
+        self._unlink(link)
+      elif len(self._links) >= self._max_entries:
+        self._unlink(self._root[self.PREV])
+        self._evictions += 1
+      self._link([None, None, key, value, time.time() + ttl])
+    finally:
+      self._lock.release()
+
+  def invalidate(self, key):
+    """Forgets the value stored for key, if any."""
+    self._lock.acquire()
+    try:
+      self._version += 1
+      link = self._links.get(key)
+      if link != None:
+        self._unlink(link)
+    finally:
+      self._lock.release()
+
+  def clear(self):
+    """Forgets every value."""
+    self._lock.acquire()
+    try:
+      self._version += 1
+      self._links.clear()
+      self._root[:] = [self._root, self._root, None, None, None]
+    finally:
+      self._lock.release()
+
+  def stats(self):
+    """Returns the number of entries, hits, misses, evictions and expirations."""
+    self._lock.acquire()
+    try:
+      return { 'entries': len(self._links), 'hits': self._hits, 'misses': self._misses, \
+               'evictions': self._evictions, 'expirations': self._expirations }
+    finally:
+      self._lock.release()
+
+  def _link(self, link):
+    # insert at the front, as the most recently used
+    first = self._root[self.NEXT]
+    link[self.PREV], link[self.NEXT] = self._root, first
+    first[self.PREV] = link
+    self._root[self.NEXT] = link
+    self._links[link[self.KEY]] = link
+
+  def _unlink(self, link):
+    link[self.PREV][self.NEXT] = link[self.NEXT]
+    link[self.NEXT][self.PREV] = link[self.PREV]
+    del self._links[link[self.KEY]]
@@ -15,12 +15,19 @@
 # limitations under the License.
 #
 ###############################################################################
+import sys
 import time, calendar
 import logging
+import threading
 from locomatix import logger
+from locomatix.exceptions import ObjectDoesNotExist, ZoneDoesNotExist, FenceDoesNotExist
+from locomatix.futures import BackgroundIterator, WorkerPool
 
 log = logging.getLogger('locomatix')
 
+# seconds between progress reports of delete_all
+PROGRESS_INTERVAL = 5
+
 def dprint(args, response, alt_message):
   if args.get('raw'):
     log.log(logger.RAW, '\nResponse:\n%s' % response)
@@ -28,6 +35,11 @@ def dprint(args, response, alt_message):
     if alt_message:
       print alt_message
 
+def progress(args, message):
+  # raw output holds only response bodies
+  if not args.get('raw'):
+    print message
+
 def convert_time(sometime):
   if isinstance(sometime, (int, float)):
     return sometime
@@ -60,3 +72,77 @@ def form_nvpairs(argnvpairs):
 
   return nvpairs
 
+
+def convert_workers(args):
+  try:
+    workers = int(args.get('workers') or 1)
+  except ValueError:
+    workers = 0
+  if workers < 1:
+    print "error: workers must be a positive number"
+    sys.exit(1)
+  return workers
+
+def delete_all(args, list_items, delete_item, what, workers):
+  """Deletes every item of list_items() with delete_item(item), running up to
+  workers deletes at once while the next items are listed in the background.
+  Items that are gone by the time they are deleted count as deleted.  Since
+  deleting may shift the pages still to be listed, listing is repeated until
+  a pass lists nothing or deletes nothing itself.  Prints the progress and
+  rate unless the output is raw, and raises the first error other than a
+  missing item once the running deletes are done.
+
+  Return:
+    The number of items deleted"""
+  state = { 'deleted': 0, 'removed': 0, 'error': None }
+  lock = threading.Lock()
+  slots = threading.Semaphore(workers * 2)
+
+  def finished(future):
+    try:
+      ex = future.exception()
+      lock.acquire()
+      try:
+        if ex == None:
+          state['deleted'] += 1
+          state['removed'] += 1
+        elif isinstance(ex, (ObjectDoesNotExist, ZoneDoesNotExist, FenceDoesNotExist)):
+          state['deleted'] += 1
+        elif state['error'] == None:
+          state['error'] = ex
+      finally:
+        lock.release()
+    finally:
+      slots.release()
+
+  starttime = reported = time.time()
+  while state['error'] == None:
+    listed, removed = 0, state['removed']
+    pool = WorkerPool(workers)
+    items = BackgroundIterator(list_items(), 2 * workers)
+    try:
+      for item in items:
+        if state['error'] != None:
+          break
+        slots.acquire()
+        pool.submit(delete_item, item).add_done_callback(finished)
+        listed += 1
+
+        now = time.time()
+        if now - reported >= PROGRESS_INTERVAL:
+          reported = now
+          progress(args, "deleted %d %s (%.1f/s)" % \
+                     (state['deleted'], what, state['deleted'] / (now - starttime)))
+    finally:
+      items.close()
+      pool.shutdown()
+    if listed == 0 or state['removed'] == removed:
+      break # nothing left, or only items that are already gone
+
+  if state['error'] != None:
+    raise state['error']
+
+  elapsed = max(time.time() - starttime, 0.001)
+  progress(args, "deleted %d %s in %.1fs (%.1f/s)" % \
+             (state['deleted'], what, elapsed, state['deleted'] / elapsed))
+  return state['deleted']
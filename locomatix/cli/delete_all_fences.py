@@ -24,22 +24,27 @@ def delete_all_fences():
   """docstring for delete_all_objects"""
   parser = locomatix.ArgsParser()
   parser.add_description("Deletes all the fences")
+  parser.add_option('workers', 'w:', 'workers=', 'No. of deletes running at the same time')
   args = parser.parse_args(sys.argv)
+  workers = convert_workers(args)
   
   try:
     lxclient = locomatix.Client(args['custid'], \
                              args['key'], \
                              args['secret-key'], \
                              args['host'], \
-                             args['port'])
+                             args['port'], \
+                             pool_size=workers + 1)
   except:
     print "Unable to connect to %s at port %d" % (args['host'],args['port'])
     sys.exit(1)
   
   try:
-    for fence in lxclient.list_fences():
+    def delete_fence(fence):
       lxclient.delete_fence(fence.fenceid)
       dprint(args, lxclient.response_body(), None)
+
+    delete_all(args, lxclient.list_fences, delete_fence, 'fences', workers)
  
   except locomatix.LxException, e:
     dprint(args, lxclient.response_body(), "error: failed to delete all fences - %s" % str(e))
@@ -25,14 +25,17 @@ def delete_all_objects():
   parser = locomatix.ArgsParser()
   parser.add_description("Deletes all the objects in one or several feeds")
   parser.add_arg('feeds', 'Name of the feeds', True)
+  parser.add_option('workers', 'w:', 'workers=', 'No. of deletes running at the same time')
   args = parser.parse_args(sys.argv)
+  workers = convert_workers(args)
   
   try:
     lxclient = locomatix.Client(args['custid'], \
                              args['key'], \
                              args['secret-key'], \
                              args['host'], \
-                             args['port'])
+                             args['port'], \
+                             pool_size=workers + 1)
   except:
     print "Unable to connect to %s at port %d" % (args['host'],args['port'])
     sys.exit(1)
@@ -42,10 +45,13 @@ def delete_all_objects():
   try:
     for feed in feeds:
       try:
-        for obj in lxclient.list_objects(feed):
+        def delete_object(obj):
           lxclient.delete_object(obj.objectid, obj.feed)
           dprint(args, lxclient.response_body(), None)
 
+        delete_all(args, lambda: lxclient.list_objects(feed), delete_object, \
+                   'objects in %s' % feed, workers)
+
       except locomatix.LxException, e:
         dprint(args, lxclient.response_body(), "error: failed to delete all objects in %s - %s" % (feed, str(e)))
         sys.exit(1)
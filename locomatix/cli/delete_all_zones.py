@@ -27,14 +27,17 @@ def delete_all_zones():
   parser.add_description("Gets the details of all zones attached to object")
   parser.add_arg('feed',    'Name of the feed')
   parser.add_arg('objectids','Objects attached to the zones', True)
+  parser.add_option('workers', 'w:', 'workers=', 'No. of deletes running at the same time')
   args = parser.parse_args(sys.argv)
+  workers = convert_workers(args)
   
   try:
     lxclient = locomatix.Client(args['custid'], \
                              args['key'], \
                              args['secret-key'], \
                              args['host'], \
-                             args['port'])
+                             args['port'], \
+                             pool_size=workers + 1)
   except:
     print "Unable to connect to %s at port %d" % (args['host'],args['port'])
     sys.exit(1)
@@ -44,10 +47,13 @@ def delete_all_zones():
 
   try:
  
+    def delete_zone(zone):
+      lxclient.delete_zone(zone.zoneid, zone.objectid, zone.feed)
+      dprint(args, lxclient.response_body(), None)
+
     for objectid in objectids:
-      for zone in lxclient.list_zones(objectid, feed):
-        lxclient.delete_zone(zone.zoneid, zone.objectid, zone.feed)
-        dprint(args, lxclient.response_body(), None)
+      delete_all(args, lambda: lxclient.list_zones(objectid, feed), delete_zone, \
+                 'zones of %s' % objectid, workers)
 
   except locomatix.LxException, e:
     dprint(args, lxclient.response_body(), \
@@ -19,14 +19,33 @@ from requests import *
 from responses import *
 from defaults import *
 from exceptions import *
+from pool import ConnectionPool
+from futures import BackgroundIterator, LxFuture, MergedIterator, WorkerPool
+from adaptive import AdaptiveFetchSize
+from cache import LRUCache
+from retry import RetryPolicy
 import locomatix.logger as logger
 import locomatix.lql as lql
+import copy
 import logging
+import threading
+import math, re
 import sys, time
-major, minor, micro, releaselevel, serial = sys.version_info
-SUPPORT_TIMEOUT = (major >= 2 and minor >= 6)
 log = logging.getLogger('locomatix')
 
+# queries whose results are aggregates rather than locations
+AGGREGATE_QUERY = re.compile(r'\b(COUNT|SUM|MAX|MIN)\s*\(', re.IGNORECASE)
+
+# Request types that may be coalesced -> the attribute of their response that
+# holds the parsed result
+COALESCIBLE_REQUESTS = {
+  'get_attributes':  'object',
+  'get_location':    'location',
+  'get_zone':        'zone',
+  'get_fence':       'fence',
+  'get_histogram':   'grid_aggregates',
+}
+
 
 try: import simplejson as json
 except ImportError:
@@ -61,6 +80,8 @@ REQUEST_RESPONSES = {
   'delete_fence':        (DeleteFenceRequest,        DeleteFenceResponse),
   'get_location_history':(GetLocationHistoryRequest, GetLocationHistoryResponse),
   'get_space_activity':  (GetSpaceActivityRequest,   GetSpaceActivityResponse),
+  'get_location_history_columns': (GetLocationHistoryRequest, LocationColumnsResponse),
+  'get_space_activity_columns':   (GetSpaceActivityRequest,   LocationColumnsResponse),
   'get_histogram':       (GetHistogramRequest,       GetHistogramResponse),
 }
 
@@ -70,12 +91,49 @@ class Client():
   All connection information and authorization credentials must be provided at
   initialization.  Upon initialization the client establishes a persistent
   connection to the remote server.  Multiple requests may be sent over the open
-  connection before the user closes the connection with close()."""
+  connection before the user closes the connection with close().
+
+  With pool_size greater than one the client keeps a pool of persistent
+  connections and a single client may be shared by many threads.  Each request
+  checks out a connection for its duration; response_metadata() and
+  response_body() report the last request made by the calling thread.
+
+  Paginated methods accept read_ahead to fetch the next batches on a
+  background thread while the current one is consumed; this overlaps best
+  when the pool has a spare connection.  Their fetch_size may also be an
+  AdaptiveFetchSize, or 'adaptive', to size each batch from the latency and
+  payload of the previous ones.
+
+  With cache_size greater than zero get_attributes and get_location answer
+  repeated reads of an object from a local cache for up to cache_ttl seconds;
+  a cached location is never kept past the feed's location_expiry.  Updates
+  and deletes made through this client invalidate the cached entries of the
+  object, changes made by other clients are seen once the entries expire.
+  ObjectDoesNotExist and FeedDoesNotExist answers to those reads are cached
+  in a store of their own, of negative_cache_size entries (by default
+  cache_size), for negative_cache_ttl seconds or until this client creates
+  the object or feed.  It works with cache_size 0 as well.
+
+  Request types listed in coalesce (see COALESCIBLE_REQUESTS) are sent once
+  when several threads make the identical request at the same time; the
+  other threads wait for that response instead of sending their own.
+
+  With stream the rows of paginated results are parsed from the socket as
+  they arrive and handed straight to the response handler, so the raw body
+  of a page is never held in memory.  Only the raw bytes are saved: the
+  handlers of lazily built pages (LxRows, used by list_objects and the
+  searches) still keep every decoded row of the page, and the others keep
+  every result, so memory is still bounded by fetch_size rather than flat.
+  response_body() then leaves out the rows (Result.Objects) of such pages."""
   
   def __init__(self, custid, custkey, secretkey, 
                     host = DEFAULT_LOCOMATIX_HOST, \
                     port = None, version = DEFAULT_LOCOMATIX_VERSION, \
-                    timeout=10, retry=3):
+                    timeout=10, retry=3, pool_size=DEFAULT_POOL_SIZE, \
+                    max_idle=DEFAULT_POOL_MAX_IDLE, cache_size=0, \
+                    cache_ttl=DEFAULT_CACHE_TTL, \
+                    negative_cache_ttl=DEFAULT_NEGATIVE_CACHE_TTL, \
+                    negative_cache_size=None, coalesce=(), breaker=None, stream=False):
     """Initializes a persistent connection with the Locomatix server.
     
     Args:
@@ -86,7 +144,18 @@ class Client():
       port:      Locomatix Server port, required
       version:   Locomatix API version, required (currently 0.9)
       timeout:   Locomatix server connection timeout
-      retry:     No. of retries while connecting to Locomatix service""" 
+      retry:     No. of attempts of a request, or a RetryPolicy
+      pool_size: No. of persistent connections shared by all threads
+      max_idle:  Seconds after which an idle pooled connection is closed
+      cache_size: No. of attributes and of locations cached, 0 disables caching
+      cache_ttl: Seconds a cached attribute or location is used
+      negative_cache_ttl: Seconds a missing object or feed is remembered
+      negative_cache_size: No. of missing objects and feeds remembered, 0
+                 disables it, None uses cache_size
+      coalesce:  Request types whose identical concurrent requests are sent once
+      breaker:   CircuitBreaker that suspends requests while the service fails
+      stream:    Parse the rows of large pages as they are read from the socket;
+                 saves the raw body, the decoded rows of a page are still kept""" 
     self._http_headers = {
       'lx-custid':custid,
       'lx-custkey':custkey,
@@ -98,22 +167,97 @@ class Client():
     else:
       self._port = port
     self._timeout = timeout
-    self._retry = retry
-    self._conn = None
-    self._response_metadata = None
-    self._response_body = None
-    self._total_time = 0.0
+    if isinstance(retry, RetryPolicy):
+      self._retry_policy = retry
+    else:
+      self._retry_policy = RetryPolicy(max_attempts=retry)
+    self._local = threading.local()
+    self._expiry = dict()   # feed -> location expiry in seconds, None if forever
+    self._expiry_lock = threading.Lock()
+    self._attributes_cache = None
+    self._location_cache = None
+    self._missing_cache = None
+    if cache_size > 0:
+      self._attributes_cache = LRUCache(cache_size, cache_ttl)
+      self._location_cache = LRUCache(cache_size, cache_ttl)
+    if negative_cache_size == None:
+      negative_cache_size = cache_size
+    if negative_cache_size > 0 and negative_cache_ttl > 0:
+      self._missing_cache = LRUCache(negative_cache_size, negative_cache_ttl)
+    for request_type in coalesce:
+      if request_type not in COALESCIBLE_REQUESTS:
+        raise ValueError("%s requests cannot be coalesced" % request_type)
+    self._coalesce = frozenset(coalesce)
+    self._breaker = breaker
+    self._stream = stream
+    self._inflight = dict()  # (method, uri, body) -> LxFuture of the leader
+    self._inflight_lock = threading.Lock()
+    self._pool = ConnectionPool(self._host, self._port, timeout, \
+                                pool_size, max_idle)
     self._open()
   
   def close(self):
     """Closes the connection with the remote Locomatix server."""
-    self._conn.close()
+    self._pool.close()
   
   def response_metadata(self):
-    return self._response_metadata
+    return getattr(self._local, 'response_metadata', None)
 
   def response_body(self):
-    return self._response_body
+    # the body of the last response is only pretty-printed when asked for
+    body = getattr(self._local, 'response_body', None)
+    if body != None and not isinstance(body, basestring):
+      body = json.dumps(body, indent=4)
+      self._local.response_body = body
+    return body
+
+  def circuit_state(self):
+    """Returns the state of the circuit breaker ('closed', 'open' or
+    'half-open'), None without a breaker."""
+    if self._breaker == None:
+      return None
+    return self._breaker.state()
+
+  def retry_stats(self):
+    """Returns the counters of the retry policy."""
+    return self._retry_policy.stats()
+
+  def cache_stats(self):
+    """Returns the counters of the attributes, location and missing object
+    caches that are enabled, None if none is."""
+    stats = dict()
+    if self._attributes_cache != None:
+      stats['attributes'] = self._attributes_cache.stats()
+      stats['location'] = self._location_cache.stats()
+    if self._missing_cache != None:
+      stats['missing'] = self._missing_cache.stats()
+    if len(stats) == 0:
+      return None
+    return stats
+
+  def location_expiry(self, feed):
+    """Returns the location expiry of a feed in seconds, None if forever or
+    unknown.  The expiries are looked up through list_feeds once and
+    remembered."""
+    self._expiry_lock.acquire()
+    try:
+      if feed in self._expiry:
+        return self._expiry[feed]
+    finally:
+      self._expiry_lock.release()
+
+    expiries = dict()
+    for lxfeed in self.list_feeds():
+      expiry = lxfeed.location_expiry
+      expiries[lxfeed.feed] = None if expiry == 'forever' else float(expiry)
+
+    self._expiry_lock.acquire()
+    try:
+      self._expiry.update(expiries)
+      self._expiry.setdefault(feed, None)
+      return self._expiry[feed]
+    finally:
+      self._expiry_lock.release()
 
   ###################################################################################
   # create_feed
@@ -133,6 +277,8 @@ class Client():
       A CreateFeedResponse object"""
 
     self._request('create_feed', feed, object_expiry, location_expiry, name_values)
+    if self._missing_cache != None:
+      self._missing_cache.invalidate((feed, None))
   
   ###################################################################################
   # delete_feed
@@ -188,6 +334,7 @@ class Client():
       Nothing"""
 
     self._request('create_object', objectid, feed, name_values, location, time)
+    self._invalidate(objectid, feed)
 
   ###################################################################################
   # create_object_location
@@ -205,11 +352,51 @@ class Client():
     Return:
       Nothing"""
 
+    if not lname_values:
+      # The location goes along with the object in a single request
+      self._request('create_object', objectid, feed, dict(), location, time)
+      self._invalidate(objectid, feed)
+      return
+
     # Create the object
     self._request('create_object', objectid, feed, dict(), None, 0)
 
     # Now update the location
     self._request('update_location', objectid, feed, location, time, lname_values)
+    self._invalidate(objectid, feed)
+
+  ###################################################################################
+  # create_object_locations
+  #    - create many objects in the feed, each with a location, several objects at
+  #      a time. The requests overlap only as far as the pool_size allows.
+  ###################################################################################
+  def create_object_locations(self, feed, objlocs, workers=DEFAULT_CREATE_WORKERS):
+    """
+    Args:
+      feed: Feed name in which the objects need to be created, required
+      objlocs: (objectid, location, time) or (objectid, location, time, lname_values)
+        tuples, required
+      workers: number of objects created at the same time, optional
+    
+    Return:
+      A dict of objectid -> exception for the objects that were not created"""
+
+    pool = WorkerPool(workers)
+    try:
+      futures = []
+      for objloc in objlocs:
+        objectid, location, time = objloc[:3]
+        lname_values = objloc[3] if len(objloc) > 3 else {}
+        futures.append((objectid, pool.submit(self.create_object_location, \
+                                              objectid, feed, location, time, lname_values)))
+    finally:
+      pool.shutdown()
+
+    failed = dict()
+    for objectid, future in futures:
+      if future.exception() != None:
+        failed[objectid] = future.exception()
+    return failed
   
   ###################################################################################
   # delete_object
@@ -225,18 +412,23 @@ class Client():
       Nothing"""
 
     self._request('delete_object', objectid, feed)
+    self._invalidate(objectid, feed)
 
   ###################################################################################
   # list_objects
   #    - List all the object and their profiles in a feed. Returns all the objects
   #      in the feed one by one.
   ##################################################################################
-  def list_objects(self, feed, fetch_size=DEFAULT_FETCH_SIZE):
+  def list_objects(self, feed, fetch_size=DEFAULT_FETCH_SIZE, read_ahead=0, projection=None):
     """
     Args:
       feed: A feed name, required
       fetch_size: number of objects to return in a batch, optional
         default = 20
+      read_ahead: number of batches to fetch in the background, optional
+        default = 0
+      projection: PROJECT_IDS to leave out the name-values, optional
+        default = None
     
     Return:
       An LxObject object"""
@@ -246,7 +438,7 @@ class Client():
       raise EXCEPTIONS['InvalidFeed']
 
     query = lql.SelectObject(feed)
-    for obj in self._list_objects(query, fetch_size):
+    for obj in self._list_objects(query, fetch_size, read_ahead, projection):
       yield obj
 
   ###################################################################################
@@ -254,12 +446,16 @@ class Client():
   #    - Query objects and their profiles in a feed. Returns those objects that 
   #      satisfy the query.
   ##################################################################################
-  def query_objects(self, query, fetch_size=DEFAULT_FETCH_SIZE):
+  def query_objects(self, query, fetch_size=DEFAULT_FETCH_SIZE, read_ahead=0, projection=None):
     """
     Args:
       query: A query, required
       fetch_size: number of objects to return in a batch, optional
         default = 20
+      read_ahead: number of batches to fetch in the background, optional
+        default = 0
+      projection: PROJECT_IDS to leave out the name-values, optional
+        default = None
     
     Return:
       An LxObject or LxAggregate object"""
@@ -267,7 +463,7 @@ class Client():
     if not isinstance(query, lql.Query):
       raise EXCEPTIONS['InvalidQuery']
 
-    for obj in self._list_objects(query, fetch_size):
+    for obj in self._list_objects(query, fetch_size, read_ahead, projection):
       yield obj
 
   ###################################################################################
@@ -286,6 +482,7 @@ class Client():
       Nothing"""
 
     self._request('update_attributes', objectid, feed, name_values)
+    self._invalidate(objectid, feed, location=False)
 
   ###################################################################################
   # get_attributes
@@ -300,8 +497,16 @@ class Client():
     Return:
       A LxObject object"""
 
-    response = self._request('get_attributes', objectid, feed)
-    return response.object
+    if self._attributes_cache == None:
+      return self._missing_aware_request('get_attributes', objectid, feed).object
+
+    key = (feed, objectid)
+    obj = self._attributes_cache.get(key)
+    if obj == None:
+      version = self._attributes_cache.version()
+      obj = self._missing_aware_request('get_attributes', objectid, feed).object
+      self._attributes_cache.put(key, obj, version=version)
+    return copy.deepcopy(obj)
   
   ###################################################################################
   # update_location
@@ -325,6 +530,7 @@ class Client():
       Nothing"""
 
     self._request('update_location', objectid, feed, location, time, name_values)
+    self._invalidate(objectid, feed, attributes=False)
   
   ###################################################################################
   # get_location
@@ -342,16 +548,79 @@ class Client():
     Return:
       An LxLocation object"""
 
-    response = self._request('get_location', objectid, feed, allow_expired)
-    return response.location
+    if allow_expired:
+      response = self._request('get_location', objectid, feed, allow_expired)
+      return response.location
+    if self._location_cache == None:
+      return self._missing_aware_request('get_location', objectid, feed, allow_expired).location
+
+    key = (feed, objectid)
+    location = self._location_cache.get(key)
+    if location == None:
+      version = self._location_cache.version()
+      location = self._missing_aware_request('get_location', objectid, feed, allow_expired).location
+      ttl = None
+      expiry = self.location_expiry(feed)
+      if expiry != None and location.time != None:
+        # the server drops the location once it is expiry seconds old
+        ttl = float(location.time) + expiry - time.time()
+      self._location_cache.put(key, location, ttl, version)
+    return copy.deepcopy(location)
   
+  ###################################################################################
+  # get_locations
+  #    - get the current locations of many objects of a feed. The objects are looked
+  #      up in chunks with one query per chunk, several chunks at a time.
+  ###################################################################################
+  def get_locations(self, feed, objectids, chunk_size=DEFAULT_GET_LOCATIONS_CHUNK_SIZE, \
+                          workers=DEFAULT_GET_LOCATIONS_WORKERS):
+    """Get the current locations of many objects.
+    
+    Args:
+      feed: Feed name that contains the objects, required
+      objectids: Keys of the objects within the feed, required
+      chunk_size: number of objects looked up by one query, optional
+      workers: number of queries run at the same time, optional
+    
+    Return:
+      A dict of objectid -> LxLocation, and a list of the objectids that
+      have no current location or do not exist"""
+
+    if not isinstance(feed, str) and not isinstance(feed, unicode):
+      raise EXCEPTIONS['InvalidFeed']
+
+    objectids = list(objectids)
+    chunks = []
+    for i in range(0, len(objectids), chunk_size):
+      query = lql.SelectObjectLocation(feed, *objectids[i:i + chunk_size])
+      chunks.append(self._search_region(WORLD, query, chunk_size))
+
+    locations = dict()
+    objlocs = MergedIterator(chunks, workers, chunk_size * workers)
+    try:
+      for objloc in objlocs:
+        # search results keep the coordinates as sent, get_location floats them
+        location = LxLocation()
+        if objloc.latitude != None:
+          location.latitude = float(objloc.latitude)
+        if objloc.longitude != None:
+          location.longitude = float(objloc.longitude)
+        location.time = objloc.time
+        location.lname_values = objloc.lname_values
+        locations[objloc.objectid] = location
+    finally:
+      objlocs.close()
+
+    missing = [objectid for objectid in objectids if objectid not in locations]
+    return locations, missing
+
   ###################################################################################
   # search_nearby
   #    - search nearby the last known location of the given object. The search returns
   #      results only if location of the object is expired.
   ###################################################################################
   def search_nearby(self, objectid, feed, objectregion, from_feed, \
-                            fetch_size = DEFAULT_FETCH_SIZE):
+                            fetch_size = DEFAULT_FETCH_SIZE, read_ahead=0, projection=None):
     """
     Args:
       objectid: Key that uniquely identifes the object within the feed, required
@@ -360,6 +629,11 @@ class Client():
       from_feed: Feed to get objects from
       fetch_size: number of objects to return in a batch, optional
         default = 20
+      read_ahead: number of batches to fetch in the background, optional
+        default = 0
+      projection: PROJECT_IDS or PROJECT_LOCATIONS to leave out the
+        name-values (and with PROJECT_IDS the location), optional
+        default = None
     
     Return:
       Multiple LxObjectLocation or a LxAggregate"""
@@ -368,7 +642,8 @@ class Client():
       raise EXCEPTIONS['InvalidFromFeed']
 
     query = lql.SelectObjectLocation(from_feed)
-    for obj in self._search_nearby(objectid, feed, objectregion, query, fetch_size):
+    for obj in self._search_nearby(objectid, feed, objectregion, query, fetch_size, read_ahead, \
+                                   projection):
       yield obj
 
   ###################################################################################
@@ -377,7 +652,7 @@ class Client():
   #      results only if location of the object is expired.
   ###################################################################################
   def query_search_nearby(self, objectid, feed, objectregion, query, \
-                            fetch_size = DEFAULT_FETCH_SIZE):
+                            fetch_size = DEFAULT_FETCH_SIZE, read_ahead=0, projection=None):
     """
     Args:
       objectid: Key that uniquely identifes the object within the feed, required
@@ -386,6 +661,11 @@ class Client():
       query: LQL to execute
       fetch_size: number of objects to return in a batch, optional
         default = 20
+      read_ahead: number of batches to fetch in the background, optional
+        default = 0
+      projection: PROJECT_IDS or PROJECT_LOCATIONS to leave out the
+        name-values (and with PROJECT_IDS the location), optional
+        default = None
     
     Return:
       Multiple LxObjectLocation or a LxAggregate"""
@@ -393,7 +673,8 @@ class Client():
     if not isinstance(query, lql.Query):
       raise EXCEPTIONS['InvalidQuery']
 
-    for obj in self._search_nearby(objectid, feed, objectregion, query, fetch_size):
+    for obj in self._search_nearby(objectid, feed, objectregion, query, fetch_size, read_ahead, \
+                                   projection):
       yield obj
 
   ###################################################################################
@@ -401,13 +682,19 @@ class Client():
   #    - search the objects in a given region. The search returns results from those 
   #      objects whose location have not been expired.
   ###################################################################################
-  def search_region(self, region, from_feed, fetch_size=DEFAULT_FETCH_SIZE):
+  def search_region(self, region, from_feed, fetch_size=DEFAULT_FETCH_SIZE, read_ahead=0, \
+                    projection=None):
     """
     Args:
       region : type and specification of region 
       from_feed: The feed to search
       fetch_size: Number of objects to return in a batch, optional
         default = 20
+      read_ahead: number of batches to fetch in the background, optional
+        default = 0
+      projection: PROJECT_IDS or PROJECT_LOCATIONS to leave out the
+        name-values (and with PROJECT_IDS the location), optional
+        default = None
     
     Return:
       Multiple LxObjectLocation or a LxAggregate"""
@@ -416,7 +703,7 @@ class Client():
       raise EXCEPTIONS['InvalidFromFeed']
     
     query = lql.SelectObjectLocation(from_feed)
-    for obj in self._search_region(region, query, fetch_size):
+    for obj in self._search_region(region, query, fetch_size, read_ahead, projection):
       yield obj
 
   ###################################################################################
@@ -424,13 +711,19 @@ class Client():
   #    - query for the objects in a given region. The search returns results from those 
   #      objects whose location have not been expired.
   ###################################################################################
-  def query_search_region(self, region, query, fetch_size=DEFAULT_FETCH_SIZE):
+  def query_search_region(self, region, query, fetch_size=DEFAULT_FETCH_SIZE, read_ahead=0, \
+                          projection=None):
     """
     Args:
       region : type and specification of region 
       from_feed: The feed to search
       fetch_size: Number of objects to return in a batch, optional
         default = 20
+      read_ahead: number of batches to fetch in the background, optional
+        default = 0
+      projection: PROJECT_IDS or PROJECT_LOCATIONS to leave out the
+        name-values (and with PROJECT_IDS the location), optional
+        default = None
     
     Return:
       Multiple LxObjectLocation or a LxAggregate"""
@@ -438,7 +731,7 @@ class Client():
     if not isinstance(query, lql.Query):
       raise EXCEPTIONS['InvalidQuery']
     
-    for obj in self._search_region(region, query, fetch_size):
+    for obj in self._search_region(region, query, fetch_size, read_ahead, projection):
       yield obj
 
   ###################################################################################
@@ -744,7 +1037,7 @@ class Client():
   #      profiles of the object between the times.
   ##################################################################################
   def get_location_history(self, objectid, feed, start_time, end_time, \
-                         fetch_size=DEFAULT_FETCH_SIZE):
+                         fetch_size=DEFAULT_FETCH_SIZE, read_ahead=0, workers=1, columnar=False):
     """
     Args:
       objectid: Key that uniquely identifes the object within the feed, required
@@ -753,9 +1046,17 @@ class Client():
       end_time: end of the time slice to retrieve history
       fetch_size: number of location history to return in a batch, optional
         default = 20
+      read_ahead: number of batches to fetch in the background, optional
+        default = 0
+      workers: number of time windows to fetch concurrently on as many threads
+        started for the call, optional; they overlap only as far as the
+        pool_size allows, and read_ahead must then be left at 0
+        default = 1
+      columnar: return each batch as one LxColumns, optional
+        default = False
 
     Return:
-      Multiple LxObjectLocation or a LxAggregate"""
+      Multiple LxLocation (or LxColumns) or a LxAggregate"""
 
     if not isinstance(objectid, str) and not isinstance(objectid, unicode):
       raise EXCEPTIONS['InvalidObjectID']
@@ -764,7 +1065,8 @@ class Client():
       raise EXCEPTIONS['InvalidFeed']
 
     query = lql.SelectLocation(feed, objectid)
-    for loc in self._get_location_history(query, start_time, end_time, fetch_size):
+    for loc in self._get_location_history(query, start_time, end_time, fetch_size, \
+                                          read_ahead, workers, columnar):
       yield loc
 
   ###################################################################################
@@ -772,7 +1074,8 @@ class Client():
   #    - Get the location history profile of an object in a feed. Returns the location
   #      profiles of the object that satisfies the query and between the times.
   ##################################################################################
-  def query_location_history(self, query, start_time, end_time, fetch_size=DEFAULT_FETCH_SIZE): 
+  def query_location_history(self, query, start_time, end_time, fetch_size=DEFAULT_FETCH_SIZE, \
+                           read_ahead=0, workers=1, columnar=False): 
     """
     Args:
       query: Query for the fetching the location history
@@ -780,14 +1083,23 @@ class Client():
       end_time: end of the time slice to retrieve history
       fetch_size: number of location history to return in a batch, optional
         default = 20
+      read_ahead: number of batches to fetch in the background, optional
+        default = 0
+      workers: number of time windows to fetch concurrently on as many threads
+        started for the call, optional; they overlap only as far as the
+        pool_size allows, and read_ahead must then be left at 0
+        default = 1
+      columnar: return each batch as one LxColumns, optional
+        default = False
 
     Return:
-      Multiple LxObjectLocation or a LxAggregate"""
+      Multiple LxLocation (or LxColumns) or a LxAggregate"""
 
     if not isinstance(query, lql.Query):
       raise EXCEPTIONS['InvalidQuery']
 
-    for loc in self._get_location_history(query, start_time, end_time, fetch_size):
+    for loc in self._get_location_history(query, start_time, end_time, fetch_size, \
+                                          read_ahead, workers, columnar):
       yield loc
 
   ###################################################################################
@@ -796,7 +1108,7 @@ class Client():
   #      time.  Returns the location profiles of objects. 
   ##################################################################################
   def get_space_activity(self, feed, region, start_time, end_time, \
-                         fetch_size=DEFAULT_FETCH_SIZE):
+                         fetch_size=DEFAULT_FETCH_SIZE, read_ahead=0, workers=1, columnar=False):
     """
     Args:
       feed: A feed name, required
@@ -805,9 +1117,17 @@ class Client():
       end_time: end of the time slice to retrieve history
       fetch_size: number of location history to return in a batch, optional
         default = 20
+      read_ahead: number of batches to fetch in the background, optional
+        default = 0
+      workers: number of tiles of the region to fetch concurrently on as many
+        threads started for the call, optional; they overlap only as far as
+        the pool_size allows, and read_ahead must then be left at 0
+        default = 1
+      columnar: return each batch as one LxColumns, optional
+        default = False
 
     Return:
-      Multiple LxObjectLocation """
+      Multiple LxObjectLocation (or LxColumns) """
 
     if not isinstance(feed, str) and not isinstance(feed, unicode):
       raise EXCEPTIONS['InvalidFeed']
@@ -819,7 +1139,8 @@ class Client():
       raise EXCEPTIONS['InvalidRegion']
 
     query = lql.SelectLocation(feed)
-    for loc in self._get_space_activity(query, region, start_time, end_time, fetch_size):
+    for loc in self._get_space_activity(query, region, start_time, end_time, fetch_size, \
+                                        read_ahead, workers, columnar):
       yield loc
 
   ###################################################################################
@@ -829,7 +1150,7 @@ class Client():
   #      and between the times.
   ##################################################################################
   def query_space_activity(self, query, region, start_time, end_time, \
-                           fetch_size=DEFAULT_FETCH_SIZE):
+                           fetch_size=DEFAULT_FETCH_SIZE, read_ahead=0, workers=1, columnar=False):
     """
     Args:
       query: An LQL query, required
@@ -838,9 +1159,17 @@ class Client():
       end_time: end of the time slice to retrieve history, required
       fetch_size: number of location history to return in a batch, optional
         default = 20
+      read_ahead: number of batches to fetch in the background, optional
+        default = 0
+      workers: number of tiles of the region to fetch concurrently on as many
+        threads started for the call, optional; they overlap only as far as
+        the pool_size allows, and read_ahead must then be left at 0
+        default = 1
+      columnar: return each batch as one LxColumns, optional
+        default = False
 
     Return:
-      Multiple LxObjectLocation """
+      Multiple LxObjectLocation (or LxColumns) """
 
     if not isinstance(query, lql.Query):
       raise EXCEPTIONS['InvalidQuery']
@@ -851,7 +1180,8 @@ class Client():
     if isinstance(region, Point):
       raise EXCEPTIONS['InvalidRegion']
 
-    for loc in self._get_space_activity(query, region, start_time, end_time, fetch_size):
+    for loc in self._get_space_activity(query, region, start_time, end_time, fetch_size, \
+                                        read_ahead, workers, columnar):
       yield loc
 
   ###################################################################################
@@ -907,97 +1237,403 @@ class Client():
   #######################################################
   # Private helper function for list/query objects
   #######################################################
-  def _list_objects(self, query, fetch_size):
-    start_key = DEFAULT_FETCH_STARTKEY
-    while True:
-      batch = self._request('list_objects', query._query, start_key, fetch_size)
-      if len(batch.aggrs) == 0:
-        for obj in batch.objects:
-          yield obj
-      else:
-        for aggr in batch.aggrs:
-          yield aggr
-      if batch.next_key == None:
-        break # this is the last batch
-      start_key = batch.next_key
+  def _list_objects(self, query, fetch_size, read_ahead=0, projection=None):
+    if projection not in PROJECTIONS:
+      raise ValueError("unknown projection %r" % (projection,))
+    batches = self._batches('list_objects', (query._query,), fetch_size, read_ahead)
+    try:
+      for batch in batches:
+        if len(batch.aggrs) == 0:
+          for obj in batch.objects.project(projection):
+            yield obj
+        else:
+          for aggr in batch.aggrs:
+            yield aggr
+    finally:
+      batches.close()
 
   #######################################################
   # Private helper function for get/query location history
   #######################################################
-  def _get_location_history(self, query, start_time, end_time, fetch_size): 
-    start_key = DEFAULT_FETCH_STARTKEY
-    while True:
-      batch = self._request('get_location_history', query._query, start_time, \
-                            end_time, start_key, fetch_size)
-      if len(batch.aggrs) == 0:
-        for location in batch.locations:
+  def _get_location_history(self, query, start_time, end_time, fetch_size, read_ahead=0, \
+                            workers=1, columnar=False): 
+    if columnar:
+      if workers > 1:
+        raise ValueError("columnar results are fetched by a single worker")
+      for columns in self._columns('get_location_history_columns', \
+                                   (query._query, start_time, end_time), fetch_size, read_ahead):
+        yield columns
+      return
+
+    if workers > 1:
+      if read_ahead > 0:
+        raise ValueError("workers already fetch ahead, read_ahead must be 0")
+      for loc in self._parallel_location_history(query, start_time, end_time, \
+                                                 fetch_size, workers):
+        yield loc
+      return
+
+    batches = self._batches('get_location_history', (query._query, start_time, end_time), \
+                            fetch_size, read_ahead)
+    try:
+      for batch in batches:
+        if len(batch.aggrs) == 0:
+          for location in batch.locations:
+            yield location
+        else:
+          for aggr in batch.aggrs:
+            yield aggr
+    finally:
+      batches.close()
+
+  #######################################################
+  # Private helper functions for a location history split
+  # into time windows [start, end) that are fetched by
+  # several workers at once.  The first batch tells how
+  # dense the trail is; windows are sized to hold about
+  # DEFAULT_HISTORY_WINDOW_BATCHES batches each and resized
+  # as the windows come back.  Windows are disjoint and
+  # handed out in order, so concatenating them keeps the
+  # locations in time order.  Once the consumer stops, the
+  # windows not started are cancelled and the running ones
+  # stop after their current batch.
+  #######################################################
+  def _parallel_location_history(self, query, start_time, end_time, fetch_size, workers):
+    start_time, end_time = int(start_time), int(end_time)
+    if fetch_size == 'adaptive':
+      fetch_size = AdaptiveFetchSize()
+
+    batches = self._batches('get_location_history', (query._query, start_time, end_time), \
+                            fetch_size)
+    first = batches.next()
+    batches.close()
+    if len(first.aggrs) > 0:
+      for aggr in first.aggrs:
+        yield aggr
+      return
+    if first.next_key == None or len(first.locations) == 0:
+      for location in first.locations:
+        yield location
+      return
+
+    # the locations at the last time of the first batch may continue in the
+    # next one, so that time is fetched again as part of the first window
+    last_time = first.locations[-1].time
+    for location in first.locations:
+      if location.time < last_time:
+        yield location
+
+    target = len(first.locations) * DEFAULT_HISTORY_WINDOW_BATCHES
+    window = self._window_size(last_time - start_time, len(first.locations), target)
+    next_start = last_time
+
+    pool = WorkerPool(workers)
+    stopped = threading.Event()
+    pending = []
+    try:
+      while True:
+        while next_start < end_time and len(pending) < workers:
+          wend = min(end_time, next_start + window)
+          future = pool.submit(self._history_window, query, next_start, wend, fetch_size, stopped)
+          pending.append((future, wend - next_start))
+          next_start = wend
+        if len(pending) == 0:
+          break
+        future, span = pending.pop(0)
+        locations = future.result()
+        window = min(window * 4, self._window_size(span, len(locations), target))
+        for location in locations:
           yield location
-      else:
-        for aggr in batch.aggrs:
-          yield aggr
-      if batch.next_key == None:
-        break # this is the last batch
-      start_key = batch.next_key
+    finally:
+      stopped.set()
+      for future, span in pending:
+        future.cancel()
+      pool.shutdown(wait=False)
+
+  def _history_window(self, query, start_time, end_time, fetch_size, stopped):
+    locations = []
+    history = self._get_location_history(query, start_time, end_time, fetch_size)
+    try:
+      for location in history:
+        if stopped.isSet():
+          break
+        locations.append(location)
+    finally:
+      history.close()
+    return locations
+
+  def _window_size(self, span, count, target):
+    """Seconds expected to hold target locations, given count in span seconds."""
+    if count == 0:
+      return max(1, span * 2)
+    return max(1, int(span * target / count))
 
   #######################################################
   # Private helper function for get/query space activity
   #######################################################
-  def _get_space_activity(self, query, region, start_time, end_time, fetch_size):
-    start_key = DEFAULT_FETCH_STARTKEY
-    while True:
-      batch = self._request('get_space_activity', query._query, region, start_time, \
-                            end_time, start_key, fetch_size)
-      if len(batch.aggrs) == 0:
-        for objloc in batch.objlocs:
-          yield objloc
-      else:
-        for aggr in batch.aggrs:
-          yield aggr
-      if batch.next_key == None:
-        break # this is the last batch
-      start_key = batch.next_key
+  def _get_space_activity(self, query, region, start_time, end_time, fetch_size, read_ahead=0, \
+                          workers=1, columnar=False):
+    if columnar:
+      if workers > 1:
+        raise ValueError("columnar results are fetched by a single worker")
+      for columns in self._columns('get_space_activity_columns', \
+                                   (query._query, region, start_time, end_time), fetch_size, read_ahead):
+        yield columns
+      return
+
+    if workers > 1 and isinstance(region, Polygon) and not AGGREGATE_QUERY.search(query._query):
+      if read_ahead > 0:
+        raise ValueError("workers already fetch ahead, read_ahead must be 0")
+      for objloc in self._tiled_space_activity(query, region, start_time, end_time, \
+                                               fetch_size, workers):
+        yield objloc
+      return
+
+    batches = self._batches('get_space_activity', (query._query, region, start_time, end_time), \
+                            fetch_size, read_ahead)
+    try:
+      for batch in batches:
+        if len(batch.aggrs) == 0:
+          for objloc in batch.objlocs:
+            yield objloc
+        else:
+          for aggr in batch.aggrs:
+            yield aggr
+    finally:
+      batches.close()
+
+  #######################################################
+  # Private helper functions for a space activity split
+  # into a grid of rectangular tiles that are fetched by
+  # several workers at once.  A location on the border of
+  # two tiles is kept only by the tile that owns it (the
+  # south and west borders belong to a tile, the north and
+  # east ones to its neighbour), and for a polygon only the
+  # locations inside it are kept.
+  #######################################################
+  def _tiled_space_activity(self, query, region, start_time, end_time, fetch_size, workers):
+    if fetch_size == 'adaptive':
+      fetch_size = AdaptiveFetchSize()
+    if isinstance(fetch_size, AdaptiveFetchSize):
+      buffered = DEFAULT_FETCH_SIZE * workers
+    else:
+      buffered = fetch_size * workers
+
+    ntiles = workers * DEFAULT_TILES_PER_WORKER
+    nrows = max(1, int(math.sqrt(ntiles)))
+    ncols = (ntiles + nrows - 1) // nrows
+    tiles = region.bounding_box().tiles(nrows, ncols)
+
+    clip = None
+    if not isinstance(region, Rectangle):
+      clip = region
+
+    tile_activities = []
+    for i in range(len(tiles)):
+      last_row, last_col = i // ncols == nrows - 1, i % ncols == ncols - 1
+      tile_activities.append(self._tile_activity(query, tiles[i], last_row, last_col, clip, \
+                                                 start_time, end_time, fetch_size))
+
+    objlocs = MergedIterator(tile_activities, workers, buffered)
+    try:
+      for objloc in objlocs:
+        yield objloc
+    finally:
+      objlocs.close()
+
+  def _tile_activity(self, query, tile, last_row, last_col, clip, start_time, end_time, fetch_size):
+    for objloc in self._get_space_activity(query, tile, start_time, end_time, fetch_size):
+      lat, lng = objloc.latitude, objloc.longitude
+      if lat != None and lng != None:
+        if (lat >= tile.ne_lat and not last_row) or (lng >= tile.ne_long and not last_col):
+          continue # on the border, the neighbouring tile owns it
+        if clip != None and not clip.contains(lat, lng):
+          continue
+      yield objloc
 
   #######################################################
   # Private helper function for get/query search nearby
   #######################################################
-  def _search_nearby(self, objectid, feed, objectregion, query, fetch_size):
+  def _search_nearby(self, objectid, feed, objectregion, query, fetch_size, read_ahead=0, \
+                     projection=None):
+    if projection not in PROJECTIONS:
+      raise ValueError("unknown projection %r" % (projection,))
+    batches = self._batches('search_nearby', (objectid, feed, objectregion, query._query), \
+                            fetch_size, read_ahead)
+    try:
+      for batch in batches:
+        if len(batch.aggrs) == 0:
+          for objloc in batch.objlocs.project(projection):
+            yield objloc
+        else:
+          for aggr in batch.aggrs:
+            yield aggr
+    finally:
+      batches.close()
+
+  #######################################################
+  # Private helper function for get/query search region
+  #######################################################
+  def _search_region(self, region, query, fetch_size, read_ahead=0, projection=None):
+    if projection not in PROJECTIONS:
+      raise ValueError("unknown projection %r" % (projection,))
+    batches = self._batches('search_region', (region, query._query), fetch_size, read_ahead)
+    try:
+      for batch in batches:
+        if len(batch.aggrs) == 0:
+          for objloc in batch.objlocs.project(projection):
+            yield objloc
+        else:
+          for aggr in batch.aggrs:
+            yield aggr
+    finally:
+      batches.close()
+
+  #######################################################
+  # Private helper for columnar location history and space
+  # activity: a batch is yielded as a single LxColumns.
+  #######################################################
+  def _columns(self, request_type, args, fetch_size, read_ahead):
+    batches = self._batches(request_type, args, fetch_size, read_ahead)
+    try:
+      for batch in batches:
+        if len(batch.aggrs) == 0:
+          yield batch.columns
+        else:
+          for aggr in batch.aggrs:
+            yield aggr
+    finally:
+      batches.close()
+
+  #######################################################
+  # Private helpers to walk the batches of a paginated request.
+  # The request args must end with (start_key, fetch_size).
+  # With read_ahead, up to that many batches are fetched on a
+  # background thread while the caller works on the current
+  # one; closing the returned iterator stops the fetching.
+  # fetch_size may be an AdaptiveFetchSize (or 'adaptive'),
+  # which picks the size of every batch from the previous ones.
+  #######################################################
+  def _batches(self, request_type, args, fetch_size, read_ahead=0):
+    if fetch_size == 'adaptive':
+      fetch_size = AdaptiveFetchSize()
+    if isinstance(fetch_size, AdaptiveFetchSize):
+      batches = self._fetch_adaptive_batches(request_type, args, fetch_size)
+    else:
+      batches = self._fetch_batches(request_type, args, fetch_size)
+    if read_ahead > 0:
+      batches = BackgroundIterator(batches, read_ahead)
+    return batches
+
+  def _fetch_batches(self, request_type, args, fetch_size):
     start_key = DEFAULT_FETCH_STARTKEY
     while True:
-      batch = self._request('search_nearby', objectid, feed, objectregion, query._query, \
-                                 start_key, fetch_size)
-      if len(batch.aggrs) == 0:
-        for objloc in batch.objlocs:
-          yield objloc
-      else:
-        for aggr in batch.aggrs:
-          yield aggr
-
+      batch = self._request(request_type, *(args + (start_key, fetch_size)))
+      yield batch
       if batch.next_key == None:
         break # this is the last batch
       start_key = batch.next_key
 
-  #######################################################
-  # Private helper function for get/query search region
-  #######################################################
-  def _search_region(self, region, query, fetch_size):
+  def _fetch_adaptive_batches(self, request_type, args, adaptive):
     start_key = DEFAULT_FETCH_STARTKEY
     while True:
-      batch = self._request('search_region', region, query._query, start_key, fetch_size)
-      if len(batch.aggrs) == 0:
-        for objloc in batch.objlocs:
-          yield objloc
-      else:
-        for aggr in batch.aggrs:
-          yield aggr
-
+      fetch_size = adaptive.size()
+      starttime = time.time()
+      try:
+        batch = self._request(request_type, *(args + (start_key, fetch_size)))
+      except TooBigFetch:
+        if adaptive.too_big(fetch_size):
+          continue # retry the same batch with a smaller size
+        raise
+      adaptive.observe(fetch_size, time.time() - starttime, batch.body_size, batch.nrows)
+      yield batch
       if batch.next_key == None:
         break # this is the last batch
       start_key = batch.next_key
   
 
+  #######################################################
+  # Private helpers for the attributes, location and
+  # missing object caches.
+  #######################################################
+  def _invalidate(self, objectid, feed, attributes=True, location=True):
+    if attributes and self._attributes_cache != None:
+      self._attributes_cache.invalidate((feed, objectid))
+    if location and self._location_cache != None:
+      self._location_cache.invalidate((feed, objectid))
+    if self._missing_cache != None:
+      self._missing_cache.invalidate((feed, objectid))
+
+  def _missing_aware_request(self, request_type, objectid, feed, *args):
+    """Sends a read of the object unless it or its feed is known to be
+    missing, and remembers a missing object or feed."""
+    if self._missing_cache == None:
+      return self._request(request_type, objectid, feed, *args)
+    # one lookup, so that the stats count each read once
+    exception = self._missing_cache.get_any(((feed, None), (feed, objectid)))
+    if exception != None:
+      raise exception
+    version = self._missing_cache.version()
+    try:
+      return self._request(request_type, objectid, feed, *args)
+    except (ObjectDoesNotExist, FeedDoesNotExist), ex:
+      self._remember_missing(objectid, feed, ex, version)
+      raise
+
+  def _remember_missing(self, objectid, feed, ex, version):
+    if isinstance(ex, FeedDoesNotExist):
+      self._missing_cache.put((feed, None), FeedDoesNotExist, version=version)
+    else:
+      self._missing_cache.put((feed, objectid), ObjectDoesNotExist, version=version)
+
   def _request(self, request_type, *args):
     Request, Response = REQUEST_RESPONSES[request_type]
     method, uri, body = Request(*args).dump()
+    if request_type in self._coalesce:
+      return self._coalesced_request(Response, method, uri, body, \
+                                     COALESCIBLE_REQUESTS[request_type])
+    return self._send(Response, method, uri, body)
+
+  def _coalesced_request(self, Response, method, uri, body, result):
+    key = (method, uri, body)
+    self._inflight_lock.acquire()
+    try:
+      future = self._inflight.get(key)
+      leader = future == None
+      if leader:
+        future = LxFuture()
+        self._inflight[key] = future
+    finally:
+      self._inflight_lock.release()
+
+    if leader:
+      response, exc_info = None, None
+      try:
+        response = self._send(Response, method, uri, body)
+      except:
+        exc_info = sys.exc_info()
+      self._inflight_lock.acquire()
+      try:
+        del self._inflight[key]
+      finally:
+        self._inflight_lock.release()
+      future._set_result((self.response_metadata(), getattr(self._local, 'response_body', None), \
+                          response, exc_info))
+    else:
+      metadata, response_body, response, exc_info = future.result()
+      self._local.response_metadata = metadata
+      self._local.response_body = response_body
+      # followers get their own copy of the parsed result only, the rest of
+      # the response is shared
+      if response != None:
+        response = copy.copy(response)
+        setattr(response, result, copy.deepcopy(getattr(response, result)))
+
+    if exc_info != None:
+      raise exc_info[0], exc_info[1], exc_info[2]
+    return response
+
+  def _send(self, Response, method, uri, body):
     log.log(logger.REQUEST, 'Request:\n%s http://%s:%s%s' % (method, self._host, self._port , uri))
     if body != '':
       log.log(logger.REQUEST, 'body: %s' % body)
@@ -1005,49 +1641,99 @@ class Client():
     # Note the request start time
     starttime = time.time()
 
-    # try the request response cycle retry times
-    for i in range(self._retry):
+    # try the request response cycle as long as the retry policy allows
+    policy = self._retry_policy
+    policy.record('requests')
+    attempt = 0
+    fresh = False   # use new connections from now on
+    while True:
+      attempt += 1
+      sent, status, exc_info, stale = False, None, None, False
+      if self._breaker != None:
+        self._breaker.before()
+      failed = True   # anything unexpected counts against the breaker too
       try:
-        self._conn.request(method, uri, body, self._http_headers)
-        http_response = self._conn.getresponse()
-      except Exception, ex:
-        self._conn.close()
-        self._open()
+        try:
+          conn = self._pool.checkout(fresh)
+        except ConnectionFailure, ex:
+          exc_info = sys.exc_info()
+          error = ex
+        else:
+          try:
+            conn.request(method, uri, body, self._http_headers)
+            sent = True
+            http_response = conn.getresponse()
+            status = http_response.status
+            response = Response(http_response, self._stream)
+          except Exception, ex:
+            self._pool.checkin(conn, broken=True)
+            exc_info = sys.exc_info()
+            error = ex
+            # the server may have closed the idle connection before it got
+            # the request, which then failed without a response
+            stale = sent and status == None and conn.reused
+          else:
+            # got a response, no connection problems
+            self._pool.checkin(conn)
+            response.request_signature = (self._host, self._port, method, uri, body)
+
+            # Note the request end time
+            endtime = time.time()
+
+            # Now set the response meta data and response body
+            metadata = response.get_metadata()
+            self._local.response_metadata = metadata
+    
+            # Include the total time - network + server execution
+            response.body['TotalTime'] = str((endtime-starttime)*1000)  
+            metadata._total_time = str((endtime-starttime)*1000)  
+            self._local.response_body = response.body
+
+            if metadata.message == 'Success': 
+              failed = False
+              return response 
+            error = EXCEPTIONS.get(metadata.message, UnknownError)
+
+        # only failures of the service count against the breaker
+        failed = (exc_info != None and status == None and not stale) or \
+                 (status != None and status >= 500) or error is InternalSystemError
+      finally:
+        # every before() is matched by exactly one after()
+        if self._breaker != None:
+          self._breaker.after(failed)
+
+      # a request lost on a stale connection is sent once more on a new one,
+      # whatever its method, as the client always used to
+      if stale and not fresh:
+        fresh = True
+        policy.record('retries', error)
+        log.debug('resending %s %s on a new connection after %s' % (method, uri, error))
         continue
-      else:
-        # got a response, no connection problems
-        response = Response(http_response)
-        response.request_signature = (self._host, self._port, method, uri, body)
 
-        # Note the request end time
-        endtime = time.time()
-
-        # Now set the response meta data and response body
-        self._response_metadata = response.get_metadata()
-  
-        # Include the total time - network + server execution
-        response.body['TotalTime'] = str((endtime-starttime)*1000)  
-        self._response_metadata._total_time = str((endtime-starttime)*1000)  
-        self._response_body = json.dumps(response.body, indent=4) 
-
-        if self._response_metadata.message != 'Success': 
-          raise EXCEPTIONS[self._response_metadata.message]
-        return response 
-
-    # request/response cycle failed after retries
-    self._response_metadata = None
-    raise RequestFailed(ex, self._host, self._port, self.__class__.__name__)
+      # give up unless the policy allows another attempt within the deadline
+      retry = attempt < policy.max_attempts and policy.retryable(method, error, sent, status)
+      if retry:
+        delay = policy.delay(attempt)
+        if time.time() + delay - starttime > policy.deadline:
+          policy.record('deadlines')
+          retry = False
+      if not retry:
+        policy.record('failures')
+        if exc_info == None:
+          raise error
+        if sent and status != None:
+          # the server answered with something we could not parse
+          raise exc_info[0], exc_info[1], exc_info[2]
+        # request/response cycle failed after retries
+        self._local.response_metadata = None
+        if isinstance(error, ConnectionFailure):
+          raise error
+        raise RequestFailed(error, self._host, self._port, self.__class__.__name__)
+
+      policy.record('retries', error)
+      log.debug('retrying %s %s in %.2fs after %s' % (method, uri, delay, getattr(error, '__name__', error)))
+      time.sleep(delay)
   
   def _open(self):
-    if SUPPORT_TIMEOUT:
-      self._conn = httplib.HTTPSConnection(self._host, self._port, \
-                                           timeout=self._timeout)
-    else:
-      self._conn = httplib.HTTPSConnection(self._host, self._port)
-
-    try:
-      self._conn.connect()
-    except Exception, ex:
-      raise ConnectionFailure(ex, self._host, self._port)
-
-    return # the connection was successful
+    # establish the first connection eagerly so that bad hosts fail fast
+    self._pool.checkin(self._pool.checkout())
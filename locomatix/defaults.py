@@ -23,3 +23,67 @@ DEFAULT_LOCOMATIX_PORT = 443
 DEFAULT_FETCH_STARTKEY = ''
 DEFAULT_FETCH_START    = 0
 DEFAULT_FETCH_SIZE     = 20
+
+DEFAULT_POOL_SIZE      = 1
+DEFAULT_POOL_MAX_IDLE  = 60
+
+DEFAULT_ASYNC_WORKERS      = 8
+DEFAULT_ASYNC_MAX_BUFFERED = 100
+
+DEFAULT_BATCH_SIZE        = 100
+DEFAULT_BATCH_MAX_LATENCY = 1.0
+DEFAULT_BATCH_MAX_PENDING = 10000
+DEFAULT_BATCH_SENDERS     = 4
+DEFAULT_BATCH_MAX_TRACKED = 10000
+DEFAULT_BATCH_TRACKED_TTL = 600
+
+DEFAULT_FILTER_MIN_DISTANCE       = 10.0
+DEFAULT_FILTER_MIN_HEADING        = 30.0
+DEFAULT_FILTER_HEARTBEAT_FRACTION = 0.8
+
+DEFAULT_ADAPTIVE_MIN_FETCH_SIZE = 10
+DEFAULT_ADAPTIVE_MAX_FETCH_SIZE = 5000
+DEFAULT_ADAPTIVE_LATENCY_BUDGET = 1.0
+DEFAULT_ADAPTIVE_MAX_BYTES      = 4 * 1024 * 1024
+
+DEFAULT_HISTORY_WINDOW_BATCHES = 4
+
+DEFAULT_TILES_PER_WORKER = 4
+
+DEFAULT_MIRROR_CELL_SIZE        = 0.01
+DEFAULT_MIRROR_FETCH_SIZE       = 500
+DEFAULT_MIRROR_REFRESH_INTERVAL = 10
+DEFAULT_MIRROR_REFRESH_OVERLAP  = 2
+DEFAULT_MIRROR_RELOAD_EVERY     = 60
+DEFAULT_MIRROR_ATTRIBUTES_CHUNK_SIZE = 100
+
+DEFAULT_CACHE_TTL               = 30
+DEFAULT_NEGATIVE_CACHE_TTL      = 5
+
+DEFAULT_GET_LOCATIONS_CHUNK_SIZE = 100
+DEFAULT_GET_LOCATIONS_WORKERS   = 4
+
+DEFAULT_BULK_WORKERS            = 8
+DEFAULT_BULK_CHECKPOINT_EVERY   = 1000
+DEFAULT_BULK_REPORT_INTERVAL    = 10
+
+DEFAULT_CREATE_WORKERS          = 8
+
+DEFAULT_RETRY_ATTEMPTS          = 3
+DEFAULT_RETRY_BASE_DELAY        = 0.1
+DEFAULT_RETRY_MAX_DELAY         = 5.0
+DEFAULT_RETRY_DEADLINE          = 30.0
+
+DEFAULT_BREAKER_FAILURE_RATE    = 0.5
+DEFAULT_BREAKER_WINDOW          = 20
+DEFAULT_BREAKER_MIN_REQUESTS    = 10
+DEFAULT_BREAKER_RESET_TIMEOUT   = 30.0
+DEFAULT_BREAKER_TRIALS          = 1
+
+DEFAULT_OUTBOX_SEGMENT_SIZE     = 16 * 1024 * 1024
+DEFAULT_OUTBOX_MAX_BYTES        = 1024 * 1024 * 1024
+DEFAULT_OUTBOX_FSYNC            = 1.0
+DEFAULT_OUTBOX_RETRY_INTERVAL   = 5.0
+DEFAULT_OUTBOX_CURSOR_EVERY     = 100
+
+DEFAULT_STREAM_CHUNK_SIZE       = 64 * 1024
@@ -43,6 +43,19 @@ class RequestFailed(LxException):
   def __str__(self):
     return "Locomatix %s could not be completed on %s:%d\n%s" % (self.req_type, self.host, self.port, self.ex)
 
+class CircuitOpen(LxException):
+  """Raised without contacting the server while the client's circuit breaker is open."""
+  def __init__(self, retry_after):
+    super(CircuitOpen, self).__init__(self.__class__.__name__)
+    self.retry_after = retry_after
+  def __str__(self):
+    return "Locomatix service is failing, requests are suspended for %.1fs" % self.retry_after
+
+class OutboxFull(LxException):
+  """Raised when a write does not fit in the disk space allowed to an Outbox."""
+  def __init__(self):
+    super(OutboxFull, self).__init__(self.__class__.__name__)
+
 class UnknownError(LxException):
   """Raised when the client is unable to recognize the error by the server."""
   def __init__(self):
@@ -0,0 +1,142 @@
+###############################################################################
+#
+# Copyright 2010 Locomatix, Inc.
+# 
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+# 
+#     http://www.apache.org/licenses/LICENSE-2.0
+# 
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+###############################################################################
+import threading
+from defaults import *
+from region import distance, bearing
+
+class LocationFilter(object):
+  """Suppresses location updates that carry no new information.
+
+  The filter remembers the last location sent for every object, and the
+  velocity it was moving at.  A new location is sent only if it is at least
+  min_distance meters away from where the object would be had it kept going
+  at that velocity, if the heading turned by at least min_heading degrees, or
+  if the name-value pairs changed.  Otherwise it is dropped, unless the last
+  location sent is about to expire: a heartbeat is forced once
+  heartbeat_fraction of the feed's location_expiry (as returned by
+  list_feeds) has passed, and at the latest every max_interval seconds if
+  given.
+
+  The filter can be used in place of the client for update_location, or its
+  accept() method can guard any other path, such as a LocationBatcher.  The
+  sent counter counts the updates its update_location has sent successfully,
+  accepted those let through by accept() on any path."""
+
+  def __init__(self, client, min_distance=DEFAULT_FILTER_MIN_DISTANCE, \
+                     min_heading=DEFAULT_FILTER_MIN_HEADING, \
+                     heartbeat_fraction=DEFAULT_FILTER_HEARTBEAT_FRACTION, \
+                     max_interval=None):
+    """
+    Args:
+      client: Client used to send the updates and look up feeds, required
+      min_distance: deviation in meters from the predicted position below which
+                    an update is dropped
+      min_heading: change of heading in degrees that forces an update
+      heartbeat_fraction: fraction of location_expiry after which an update is forced
+      max_interval: seconds after which an update is always forced, optional"""
+    self._client = client
+    self._min_distance = min_distance
+    self._min_heading = min_heading
+    self._heartbeat_fraction = heartbeat_fraction
+    self._max_interval = max_interval
+    self._lock = threading.Lock()
+    self._last = dict()     # (feed, objectid) -> (lat, long, time, velocity, heading, name_values)
+    self.sent = 0
+    self.accepted = 0
+    self.suppressed = 0
+
+  def update_location(self, objectid, feed, location, time, name_values={}):
+    """Sends the update through the client unless the filter drops it.
+
+    Return:
+      True if the update was sent, False if it was suppressed"""
+    if not self.accept(objectid, feed, location, time, name_values):
+      return False
+    try:
+      self._client.update_location(objectid, feed, location, time, name_values)
+    except:
+      self.forget(objectid, feed)
+      raise
+    self._lock.acquire()
+    try:
+      self.sent += 1
+    finally:
+      self._lock.release()
+    return True
+
+  def accept(self, objectid, feed, location, time, name_values={}):
+    """Decides whether an update must be sent and, if so, records it as sent."""
+    interval = self._heartbeat_interval(feed)
+    key = (feed, objectid)
+    lat, lng = float(location.latitude), float(location.longitude)
+
+    self._lock.acquire()
+    try:
+      last = self._last.get(key)
+      velocity, heading = (0.0, 0.0), None
+      if last is not None:
+        last_lat, last_lng, last_time, last_velocity, last_heading, last_nvs = last
+        elapsed = time - last_time
+
+        # dead reckoning - where the object would be had it kept its course
+        predicted_lat = last_lat + last_velocity[0] * elapsed
+        predicted_lng = last_lng + last_velocity[1] * elapsed
+        error = distance(predicted_lat, predicted_lng, lat, lng)
+
+        if distance(last_lat, last_lng, lat, lng) > 0:
+          heading = bearing(last_lat, last_lng, lat, lng)
+        send = error >= self._min_distance or name_values != last_nvs or \
+               (interval is not None and elapsed >= interval) or \
+               self._turned(last_heading, heading)
+        if not send:
+          self.suppressed += 1
+          return False
+        if elapsed > 0:
+          velocity = ((lat - last_lat) / elapsed, (lng - last_lng) / elapsed)
+      self._last[key] = (lat, lng, time, velocity, heading, dict(name_values))
+      self.accepted += 1
+      return True
+    finally:
+      self._lock.release()
+
+  def forget(self, objectid, feed):
+    """Drops what is known of an object, so that its next update is sent."""
+    self._lock.acquire()
+    try:
+      self._last.pop((feed, objectid), None)
+    finally:
+      self._lock.release()
+
+  def stats(self):
+    """Returns a dictionary of counters describing the filter."""
+    return { 'sent' : self.sent, 'accepted' : self.accepted, 'suppressed' : self.suppressed }
+
+  def _turned(self, old, new):
+    if old is None or new is None or self._min_heading is None:
+      return False
+    change = abs(new - old) % 360.0
+    return min(change, 360.0 - change) >= self._min_heading
+
+  def _heartbeat_interval(self, feed):
+    expiry = self._client.location_expiry(feed)
+    interval = None
+    if expiry is not None:
+      interval = expiry * self._heartbeat_fraction
+    if self._max_interval is not None and (interval is None or self._max_interval < interval):
+      interval = self._max_interval
+    return interval
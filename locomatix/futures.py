@@ -0,0 +1,331 @@
+###############################################################################
+#
+# Copyright 2010 Locomatix, Inc.
+# 
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+# 
+#     http://www.apache.org/licenses/LICENSE-2.0
+# 
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+###############################################################################
+import sys
+import threading
+import Queue
+
+class CancelledError(Exception):
+  """Raised by the result of a future that was cancelled before it ran."""
+  pass
+
+
+class LxFuture(object):
+  """The eventual outcome of a call running on a background thread."""
+  def __init__(self):
+    self._cond = threading.Condition()
+    self._running = False
+    self._done = False
+    self._result = None
+    self._exc_info = None
+    self._callbacks = []
+
+  def done(self):
+    """Returns True once the call has completed, successfully or not."""
+    return self._done
+
+  def result(self, timeout=None):
+    """Waits for the call to complete and returns its value.
+
+    If the call raised, the same exception is raised here."""
+    self._wait(timeout)
+    if self._exc_info is not None:
+      raise self._exc_info[0], self._exc_info[1], self._exc_info[2]
+    return self._result
+
+  def exception(self, timeout=None):
+    """Waits for the call to complete and returns the exception it raised, if any."""
+    self._wait(timeout)
+    if self._exc_info is not None:
+      return self._exc_info[1]
+    return None
+
+  def cancel(self):
+    """Cancels the call if it has not started yet.
+
+    Returns True if it was cancelled; its result then raises CancelledError."""
+    self._cond.acquire()
+    try:
+      if self._running or self._done:
+        return False
+      self._running = True
+    finally:
+      self._cond.release()
+    try:
+      raise CancelledError()
+    except CancelledError:
+      self._set_exc_info(sys.exc_info())
+    return True
+
+  def add_done_callback(self, fn):
+    """Calls fn(future) once the call completes (immediately if it already has)."""
+    self._cond.acquire()
+    try:
+      if not self._done:
+        self._callbacks.append(fn)
+        return
+    finally:
+      self._cond.release()
+    fn(self)
+
+  def _wait(self, timeout):
+    self._cond.acquire()
+    try:
+      if not self._done:
+        self._cond.wait(timeout)
+      if not self._done:
+        raise RuntimeError("timed out waiting for the result")
+    finally:
+      self._cond.release()
+
+  def _start(self):
+    """Claims the call for a worker, unless it was cancelled."""
+    self._cond.acquire()
+    try:
+      if self._running:
+        return False
+      self._running = True
+      return True
+    finally:
+      self._cond.release()
+
+  def _set_result(self, result):
+    self._finish(result, None)
+
+  def _set_exc_info(self, exc_info):
+    self._finish(None, exc_info)
+
+  def _finish(self, result, exc_info):
+    self._cond.acquire()
+    try:
+      self._result = result
+      self._exc_info = exc_info
+      self._done = True
+      callbacks, self._callbacks = self._callbacks, []
+      self._cond.notifyAll()
+    finally:
+      self._cond.release()
+    for fn in callbacks:
+      fn(self)
+
+
+class WorkerPool(object):
+  """A fixed number of daemon threads that execute submitted calls in order."""
+  def __init__(self, nworkers):
+    if nworkers < 1:
+      raise ValueError("a worker pool needs at least one worker")
+    self._tasks = Queue.Queue()
+    self._threads = []
+    for i in range(nworkers):
+      thread = threading.Thread(target=self._work)
+      thread.setDaemon(True)
+      thread.start()
+      self._threads.append(thread)
+
+  def submit(self, fn, *args, **kwargs):
+    """Schedules fn(*args, **kwargs) and returns an LxFuture for its outcome."""
+    future = LxFuture()
+    self._tasks.put((future, fn, args, kwargs))
+    return future
+
+  def map(self, fn, iterable):
+    """Submits fn(item) for every item, returning the futures in the same order."""
+    return [self.submit(fn, item) for item in iterable]
+
+  def shutdown(self, wait=True):
+    """Stops the workers once the calls already submitted have run."""
+    for thread in self._threads:
+      self._tasks.put(None)
+    if wait:
+      for thread in self._threads:
+        thread.join()
+
+  def _work(self):
+    while True:
+      task = self._tasks.get()
+      if task is None:
+        return
+      future, fn, args, kwargs = task
+      if not future._start():
+        continue # cancelled
+      try:
+        result = fn(*args, **kwargs)
+      except:
+        future._set_exc_info(sys.exc_info())
+      else:
+        future._set_result(result)
+
+
+class _Producers(object):
+  """The state shared by the background threads that drain some iterables
+  into a bounded queue.
+
+  The threads hold this rather than the iterator they feed, so that an
+  iterator dropped without close() is still collected, and stops them.  The
+  last thread to exit closes the iterables that no thread has taken."""
+
+  END = object()
+
+  def __init__(self, iterables, maxsize):
+    self.iterables = list(iterables)
+    self.queue = Queue.Queue(max(1, maxsize))
+    self.stopped = threading.Event()
+    self.threads = []
+    self._next = 0
+    self._running = 0
+    self._lock = threading.Lock()
+
+  def start(self, nthreads):
+    self._running = nthreads
+    for i in range(nthreads):
+      thread = threading.Thread(target=self._produce)
+      thread.setDaemon(True)
+      self.threads.append(thread)
+      thread.start()
+
+  def _take(self):
+    self._lock.acquire()
+    try:
+      if self._next >= len(self.iterables):
+        return None
+      iterable = self.iterables[self._next]
+      self.iterables[self._next] = None
+      self._next += 1
+      return iterable
+    finally:
+      self._lock.release()
+
+  def _put(self, item):
+    while not self.stopped.isSet():
+      try:
+        self.queue.put(item, timeout=0.1)
+        return True
+      except Queue.Full:
+        pass
+    return False
+
+  def _produce(self):
+    exc_info = None
+    try:
+      while not self.stopped.isSet():
+        iterable = self._take()
+        if iterable is None:
+          break
+        try:
+          for value in iterable:
+            if not self._put((None, value)):
+              break
+        finally:
+          if hasattr(iterable, 'close'):
+            iterable.close()
+    except:
+      exc_info = sys.exc_info()
+    self._exit()
+    self._put((self.END, exc_info))
+
+  def _exit(self):
+    self._lock.acquire()
+    try:
+      self._running -= 1
+      if self._running > 0:
+        return
+      untaken = self.iterables[self._next:]
+      self.iterables[self._next:] = [None] * len(untaken)
+      self._next = len(self.iterables)
+    finally:
+      self._lock.release()
+    for iterable in untaken:
+      if hasattr(iterable, 'close'):
+        iterable.close()
+
+
+class BackgroundIterator(object):
+  """Drains an iterable on a background thread, handing items over through a
+  bounded queue so that producing the next items overlaps with consuming them.
+
+  At most maxsize items are buffered.  Exceptions raised by the iterable are
+  re-raised to the consumer in order.  close() stops the producer early, as
+  does dropping the iterator."""
+
+  def __init__(self, iterable, maxsize=1):
+    self._producers = _Producers([iterable], maxsize)
+    self._finished = False
+    self._producers.start(1)
+
+  def __iter__(self):
+    return self
+
+  def next(self):
+    if self._finished:
+      raise StopIteration
+    kind, value = self._producers.queue.get()
+    if kind is _Producers.END:
+      self._finished = True
+      if value is not None:
+        raise value[0], value[1], value[2]
+      raise StopIteration
+    return value
+
+  def close(self):
+    """Stops the producer and discards anything buffered.
+
+    The producer notices within a fraction of a second, after finishing the
+    item it is working on, and closes the underlying iterable."""
+    self._producers.stopped.set()
+    self._finished = True
+
+  def __del__(self):
+    self._producers.stopped.set()
+
+
+class MergedIterator(object):
+  """Drains several iterables at once on a number of background threads and
+  yields their items, as they arrive, through a bounded queue.
+
+  Items of one iterable keep their order, but items of different iterables
+  interleave.  The first exception raised by any iterable stops the others
+  and is re-raised to the consumer.  close() stops all producers early, as
+  does dropping the iterator."""
+
+  def __init__(self, iterables, workers, maxsize=1):
+    self._producers = _Producers(iterables, maxsize)
+    self._running = min(workers, len(self._producers.iterables))
+    self._finished = self._running == 0
+    self._producers.start(self._running)
+
+  def __iter__(self):
+    return self
+
+  def next(self):
+    while not self._finished:
+      kind, value = self._producers.queue.get()
+      if kind is not _Producers.END:
+        return value
+      if value is not None:
+        self.close()
+        raise value[0], value[1], value[2]
+      self._running -= 1
+      self._finished = self._running == 0
+    raise StopIteration
+
+  def close(self):
+    """Stops the producers and discards anything buffered."""
+    self._producers.stopped.set()
+    self._finished = True
+
+  def __del__(self):
+    self._producers.stopped.set()
@@ -0,0 +1,246 @@
+###############################################################################
+#
+# Copyright 2010 Locomatix, Inc.
+# 
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+# 
+#     http://www.apache.org/licenses/LICENSE-2.0
+# 
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+###############################################################################
+import logging
+import math
+import threading
+import time
+from defaults import *
+from exceptions import *
+from region import *
+import locomatix.lql as lql
+
+log = logging.getLogger('locomatix')
+
+class FeedMirror(object):
+  """An in-memory copy of the current object locations of a feed that answers
+  search_region and search_nearby locally.
+
+  load() copies every object with a current location in region (the whole
+  world by default) through search_region and indexes it in a grid of
+  cell_size x cell_size degree cells.  refresh() brings the copy up to date
+  incrementally: it reads the space activity since the last load or refresh
+  and applies the newest location of every object that moved, with its
+  attributes read again, then drops the locations older than the feed's
+  location_expiry.  Deleted objects, and attribute changes of objects that
+  did not move, are only noticed by the next load(); start() runs refresh() periodically on a
+  background thread and a full load() every reload_every refreshes.
+
+  Searches return the mirrored LxObjectLocation objects themselves, which
+  must not be modified."""
+
+  def __init__(self, client, feed, region=None, cell_size=DEFAULT_MIRROR_CELL_SIZE, \
+                     fetch_size=DEFAULT_MIRROR_FETCH_SIZE):
+    """
+    Args:
+      client: Client used to read the feed, required
+      feed: name of the feed to mirror, required
+      region: Rectangle or Polygon to mirror, optional (default whole world)
+      cell_size: size of the grid cells in degrees
+      fetch_size: number of objects to fetch in a batch"""
+    self._client = client
+    self._feed = feed
+    self._region = region or WORLD
+    self._cell_size = float(cell_size)
+    self._fetch_size = fetch_size
+    self._lock = threading.RLock()
+    self._cells = dict()    # (row, col) -> { objectid : LxObjectLocation }
+    self._objects = dict()  # objectid -> LxObjectLocation
+    self._synced = None     # time of the last load or refresh
+    self._stopped = threading.Event()
+    self._thread = None
+
+  def __len__(self):
+    return len(self._objects)
+
+  def get(self, objectid):
+    """Returns the mirrored LxObjectLocation of an object, None if unknown."""
+    return self._objects.get(objectid)
+
+  def load(self):
+    """Replaces the mirror with a fresh copy of the feed."""
+    now = int(time.time())
+    cells, objects = dict(), dict()
+    for objloc in self._client.search_region(self._region, self._feed, self._fetch_size):
+      if objloc.latitude == None or objloc.longitude == None:
+        continue
+      self._insert(cells, objects, objloc)
+    self._lock.acquire()
+    try:
+      self._cells, self._objects = cells, objects
+      self._synced = now
+    finally:
+      self._lock.release()
+
+  def refresh(self):
+    """Applies the location updates made since the last load or refresh."""
+    if self._synced == None:
+      return self.load()
+
+    now = int(time.time())
+    since = self._synced - DEFAULT_MIRROR_REFRESH_OVERLAP
+    latest = dict()
+    for objloc in self._client.get_space_activity(self._feed, self._region, since, now + 1, \
+                                                  self._fetch_size):
+      known = latest.get(objloc.objectid)
+      if known == None or objloc.time >= known.time:
+        latest[objloc.objectid] = objloc
+
+    moved = []
+    for objectid, objloc in latest.items():
+      mirrored = self.get(objectid)
+      if mirrored == None or mirrored.time < objloc.time:
+        moved.append(objloc)
+
+    name_values = self._attributes([objloc.objectid for objloc in moved])
+    for objloc in moved:
+      if objloc.objectid not in name_values:
+        continue # deleted since
+      objloc.name_values = name_values[objloc.objectid]
+      self._lock.acquire()
+      try:
+        self._remove(objloc.objectid)
+        self._insert(self._cells, self._objects, objloc)
+      finally:
+        self._lock.release()
+
+    self._expire(now)
+    self._synced = now
+
+  def start(self, interval=DEFAULT_MIRROR_REFRESH_INTERVAL, reload_every=DEFAULT_MIRROR_RELOAD_EVERY):
+    """Loads the mirror and keeps it fresh on a background thread."""
+    if self._synced == None:
+      self.load()
+    self._stopped.clear()
+    self._thread = threading.Thread(target=self._run, args=(interval, reload_every))
+    self._thread.setDaemon(True)
+    self._thread.start()
+
+  def stop(self):
+    """Stops the background refreshes."""
+    self._stopped.set()
+    if self._thread != None:
+      self._thread.join()
+      self._thread = None
+
+  def search_region(self, region):
+    """Returns the mirrored objects located in a Circle, Rectangle or Polygon.
+
+    Return:
+      A list of LxObjectLocation"""
+    if not isinstance(region, LocomatixRegion) or isinstance(region, Point):
+      raise EXCEPTIONS['InvalidRegion']
+    results = []
+    self._lock.acquire()
+    try:
+      # a circle across the antimeridian has two boxes, one on either side
+      for bbox in region.bounding_boxes():
+        row_lo, col_lo = self._cell(bbox.sw_lat, bbox.sw_long)
+        row_hi, col_hi = self._cell(bbox.ne_lat, bbox.ne_long)
+        # a large box over a sparse grid visits the occupied cells instead
+        if (row_hi - row_lo + 1) * (col_hi - col_lo + 1) > len(self._cells):
+          cells = [cell for (row, col), cell in self._cells.iteritems() \
+                     if row_lo <= row <= row_hi and col_lo <= col <= col_hi]
+        else:
+          cells = [self._cells.get((row, col)) for row in xrange(row_lo, row_hi + 1) \
+                     for col in xrange(col_lo, col_hi + 1)]
+        for cell in cells:
+          if cell == None:
+            continue
+          for objloc in cell.values():
+            if bbox.contains(objloc.latitude, objloc.longitude) and \
+                 region.contains(objloc.latitude, objloc.longitude):
+              results.append(objloc)
+    finally:
+      self._lock.release()
+    return results
+
+  def search_nearby(self, objectid, feed, objectregion):
+    """Returns the mirrored objects within a relative Circle around an object.
+
+    The object's location is taken from the mirror if it belongs to the
+    mirrored feed, and fetched with get_location otherwise.
+
+    Return:
+      A list of LxObjectLocation"""
+    if not isinstance(objectregion, Circle):
+      raise EXCEPTIONS['InvalidRegion']
+    if feed == self._feed and self.get(objectid) != None:
+      center = self.get(objectid)
+    else:
+      center = self._client.get_location(objectid, feed)
+    return self.search_region(Circle(center.latitude, center.longitude, objectregion.radius))
+
+  def _attributes(self, objectids):
+    # objectid -> name-values, read with one query per chunk of objects
+    name_values = dict()
+    chunk_size = DEFAULT_MIRROR_ATTRIBUTES_CHUNK_SIZE
+    for i in range(0, len(objectids), chunk_size):
+      chunk = objectids[i:i + chunk_size]
+      query = lql.SelectObject(self._feed, *chunk)
+      for obj in self._client.query_objects(query, len(chunk)):
+        name_values[obj.objectid] = obj.name_values
+    return name_values
+
+  def _cell(self, latitude, longitude):
+    return (int(math.floor((float(latitude) + 90.0) / self._cell_size)), \
+            int(math.floor((float(longitude) + 180.0) / self._cell_size)))
+
+  def _insert(self, cells, objects, objloc):
+    objloc.latitude = float(objloc.latitude)
+    objloc.longitude = float(objloc.longitude)
+    cells.setdefault(self._cell(objloc.latitude, objloc.longitude), dict())[objloc.objectid] = objloc
+    objects[objloc.objectid] = objloc
+
+  def _remove(self, objectid):
+    objloc = self._objects.pop(objectid, None)
+    if objloc == None:
+      return
+    key = self._cell(objloc.latitude, objloc.longitude)
+    cell = self._cells.get(key)
+    if cell != None:
+      cell.pop(objectid, None)
+      if len(cell) == 0:
+        del self._cells[key]
+
+  def _expire(self, now):
+    expiry = self._client.location_expiry(self._feed)
+    if expiry == None:
+      return
+    self._lock.acquire()
+    try:
+      expired = [objectid for objectid, objloc in self._objects.items() \
+                   if objloc.time != None and objloc.time < now - expiry]
+      for objectid in expired:
+        self._remove(objectid)
+    finally:
+      self._lock.release()
+
+  def _run(self, interval, reload_every):
+    count = 0
+    while not self._stopped.isSet():
+      self._stopped.wait(interval)
+      if self._stopped.isSet():
+        break
+      count += 1
+      try:
+        if reload_every and count % reload_every == 0:
+          self.load()
+        else:
+          self.refresh()
+      except Exception, ex:
+        log.warning("refreshing the mirror of feed %s failed - %s" % (self._feed, ex))
@@ -18,8 +18,35 @@
 
 import time
 
+class LazyDict(object):
+  """A dict attribute that is only allocated when first used.
+
+  The dict lives in the slot named after the attribute with a leading
+  underscore, so that results created in bulk without name-values do not
+  carry an empty dict each."""
+  def __init__(self, name):
+    self._slot = '_' + name
+
+  def __get__(self, obj, cls):
+    if obj is None:
+      return self
+    value = getattr(obj, self._slot, None)
+    if value is None:
+      value = dict()
+      setattr(obj, self._slot, value)
+    return value
+
+  def __set__(self, obj, value):
+    setattr(obj, self._slot, value)
+
 class PrintableAttributes(object):
-  """Base class for all objects returned in locomatix responses."""
+  """Base class for all objects returned in locomatix responses.
+
+  Subclasses that are created in bulk declare __slots__ instead of carrying a
+  __dict__; _attributes() finds the attributes either way, and reports a
+  LazyDict under its own name."""
+  __slots__ = ()
+
   def __str__(self):
     """Returns a json-like representation of the object"""
     return str(self.params())
@@ -28,9 +55,29 @@ class PrintableAttributes(object):
     """Returns a json-like representation of the object"""
     return str(self.params())
 
+  def __getstate__(self):
+    return dict(self._attributes())
+
+  def __setstate__(self, state):
+    for name, value in state.items():
+      setattr(self, name, value)
+
+  def _attributes(self):
+    """Returns the (name, value) pairs of the attributes that are set."""
+    attributes = []
+    for cls in type(self).__mro__:
+      for name in cls.__dict__.get('__slots__', ()):
+        if name.startswith('__'):
+          continue
+        if isinstance(cls.__dict__.get(name[1:]), LazyDict):
+          name = name[1:]
+        if hasattr(self, name):
+          attributes.append((name, getattr(self, name)))
+    attributes.extend(getattr(self, '__dict__', {}).items())
+    return attributes
+
   def params(self):
-    params = {}
-    params.update(self.__dict__)
+    params = dict(self._attributes())
     if '_params' in params:
       del params['_params']
     return params
@@ -0,0 +1,399 @@
+###############################################################################
+#
+# Copyright 2010 Locomatix, Inc.
+# 
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+# 
+#     http://www.apache.org/licenses/LICENSE-2.0
+# 
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+###############################################################################
+import logging
+import os
+import threading
+from time import time as current_time
+from defaults import *
+from exceptions import *
+from region import createRegion
+
+try: import simplejson as json
+except ImportError:
+  try: import json
+  except ImportError:
+    raise ImportError("simplejson is not installed. Please download it from http://code.google.com/p/simplejson/")
+
+log = logging.getLogger('locomatix')
+
+# errors after which a write is retried rather than given up: the server is
+# unreachable or failing, or did not give an answer the client understands
+RETRYABLE = (RequestFailed, ConnectionFailure, CircuitOpen, InternalSystemError, UnknownError)
+
+class Outbox(object):
+  """A durable store-and-forward queue for writes.
+
+  create_object, update_attributes and update_location calls are appended to
+  segment files in directory and return as soon as they are on disk.  A
+  background thread replays them through the client in the order they were
+  made.  While the server is unreachable or failing (RequestFailed,
+  ConnectionFailure, CircuitOpen, InternalSystemError, UnknownError or an
+  answer that cannot be parsed, such as the HTML page of a 502) the head of
+  the queue is retried every retry_interval seconds.  Any other error is a
+  definite answer about the write, which is dropped and passed, with the
+  exception, to on_error(operation, args, exception).  An object that
+  already exists counts as created.
+
+  Segments roll over at segment_size bytes and are deleted once replayed.  At
+  most max_bytes of writes are kept, beyond that writes raise OutboxFull.
+  fsync is 'always' to sync every write, 'never' to leave it to the OS, or a
+  number of seconds between syncs.  The replay position is saved every
+  DEFAULT_OUTBOX_CURSOR_EVERY writes, so after a crash the writes since are
+  replayed again, at least once, and a torn last write is skipped."""
+
+  def __init__(self, client, directory, segment_size=DEFAULT_OUTBOX_SEGMENT_SIZE, \
+                     max_bytes=DEFAULT_OUTBOX_MAX_BYTES, fsync=DEFAULT_OUTBOX_FSYNC, \
+                     retry_interval=DEFAULT_OUTBOX_RETRY_INTERVAL, on_error=None):
+    """
+    Args:
+      client: Client used to replay the writes, required
+      directory: directory that holds the segment files, required
+      segment_size: size in bytes at which a new segment is started
+      max_bytes: size in bytes of the writes not yet replayed at most
+      fsync: 'always', 'never' or the seconds between syncs
+      retry_interval: seconds between attempts while the server is unreachable
+      on_error: called with (operation, args, exception) for dropped writes"""
+    if fsync not in ('always', 'never') and not isinstance(fsync, (int, float)):
+      raise ValueError("fsync must be 'always', 'never' or a number of seconds")
+    if not os.path.isdir(directory):
+      os.makedirs(directory)
+    self._client = client
+    self._directory = directory
+    self._segment_size = segment_size
+    self._max_bytes = max_bytes
+    self._fsync = fsync
+    self._retry_interval = retry_interval
+    self._on_error = on_error
+    self._lock = threading.Lock()
+    self._cond = threading.Condition(self._lock)
+    self._stopped = threading.Event()
+    self._counts = { 'appended': 0, 'replayed': 0, 'failed': 0, 'retries': 0 }
+    self._replay_time = 0.0  # seconds spent replaying
+
+    # resume reading where the last replay stopped
+    segments = self._segments()
+    self._read_segment, self._read_offset = self._load_cursor()
+    for segment in segments:
+      if segment < self._read_segment:
+        os.remove(self._path(segment))
+    segments = [segment for segment in segments if segment >= self._read_segment]
+    if len(segments) > 0 and segments[0] > self._read_segment:
+      self._read_segment, self._read_offset = segments[0], 0
+    self._bytes = sum([os.path.getsize(self._path(segment)) for segment in segments]) \
+                    - (self._read_offset if len(segments) > 0 else 0)
+    self._reader = None
+    self._since_cursor = 0
+
+    # always write to a new segment, the last one may end with a torn write
+    self._write_segment = max(segments + [self._read_segment - 1]) + 1
+    if len(segments) == 0:
+      self._read_segment, self._read_offset = self._write_segment, 0
+    self._open_writer()
+
+    self._thread = threading.Thread(target=self._replay)
+    self._thread.setDaemon(True)
+    self._thread.start()
+
+  def create_object(self, objectid, feed, name_values={}, location=None, time=0):
+    """Queues a Client.create_object call."""
+    self._append('create_object', { 'objectid': objectid, 'feed': feed, \
+        'name_values': name_values, 'location': self._location(location), 'time': time })
+
+  def update_attributes(self, objectid, feed, name_values):
+    """Queues a Client.update_attributes call."""
+    self._append('update_attributes', { 'objectid': objectid, 'feed': feed, \
+        'name_values': name_values })
+
+  def update_location(self, objectid, feed, location, time, name_values={}):
+    """Queues a Client.update_location call."""
+    self._append('update_location', { 'objectid': objectid, 'feed': feed, \
+        'location': self._location(location), 'time': time, 'name_values': name_values })
+
+  def pending_bytes(self):
+    """Returns the size in bytes of the writes not yet replayed."""
+    return self._bytes
+
+  def flush(self, timeout=None):
+    """Waits until every queued write has been replayed.
+
+    Return:
+      True if the queue is empty, False if timeout seconds passed first"""
+    deadline = None if timeout == None else current_time() + timeout
+    self._cond.acquire()
+    try:
+      while self._bytes > 0 and not self._stopped.isSet():
+        remaining = None if deadline == None else deadline - current_time()
+        if remaining != None and remaining <= 0:
+          return False
+        self._cond.wait(remaining if remaining != None else 0.5)
+      return self._bytes == 0
+    finally:
+      self._cond.release()
+
+  def close(self):
+    """Stops replaying and closes the segment files; the writes not yet
+    replayed are replayed by the next Outbox on the same directory."""
+    self._stopped.set()
+    self._cond.acquire()
+    try:
+      self._cond.notifyAll()
+    finally:
+      self._cond.release()
+    self._thread.join()
+    self._cond.acquire()
+    try:
+      self._sync(True)
+      self._writer.close()
+      self._save_cursor()
+    finally:
+      self._cond.release()
+
+  def stats(self):
+    """Returns the no. of writes appended, replayed, dropped and retried, the
+    bytes pending, and the writes replayed per second of replaying."""
+    self._cond.acquire()
+    try:
+      stats = dict(self._counts)
+      stats['pending_bytes'] = self._bytes
+      rate = 0.0
+      if self._replay_time > 0:
+        rate = (stats['replayed'] + stats['failed']) / self._replay_time
+      stats['replay_rate'] = rate
+      return stats
+    finally:
+      self._cond.release()
+
+  def _location(self, location):
+    if location == None:
+      return None
+    return location.to_map()
+
+  def _append(self, operation, args):
+    line = json.dumps({ 'op': operation, 'args': args }) + '\n'
+    self._cond.acquire()
+    try:
+      if self._stopped.isSet():
+        raise ValueError("the outbox is closed")
+      if self._bytes + len(line) > self._max_bytes:
+        raise OutboxFull
+      if self._write_size > 0 and self._write_size + len(line) > self._segment_size:
+        self._sync(True)
+        self._writer.close()
+        self._write_segment += 1
+        self._open_writer()
+      self._writer.write(line)
+      self._writer.flush()
+      self._sync(False)
+      self._write_size += len(line)
+      self._bytes += len(line)
+      self._counts['appended'] += 1
+      self._cond.notifyAll()
+    finally:
+      self._cond.release()
+
+  def _sync(self, force):
+    # callers hold the lock
+    if self._fsync == 'never':
+      return
+    now = current_time()
+    if force or self._fsync == 'always' or now - self._synced >= self._fsync:
+      self._writer.flush()
+      os.fsync(self._writer.fileno())
+      self._synced = now
+
+  def _open_writer(self):
+    self._writer = open(self._path(self._write_segment), 'ab')
+    self._write_size = 0
+    self._synced = current_time()
+
+  def _replay(self):
+    while not self._stopped.isSet():
+      record = self._next_record()
+      if record == None:
+        continue
+      starttime = current_time()
+      try:
+        send = self._sender(record)
+      except Exception, ex:
+        # a write that cannot even be built is dropped
+        log.warning("dropping outbox write %s - %s" % (record['op'], ex))
+        self._consumed(record['size'], 'failed', current_time() - starttime)
+        continue
+      while not self._stopped.isSet():
+        try:
+          send()
+          outcome = 'replayed'
+        except Exception, ex:
+          if not isinstance(ex, LxException) or isinstance(ex, RETRYABLE):
+            self._cond.acquire()
+            try:
+              self._counts['retries'] += 1
+            finally:
+              self._cond.release()
+            self._stopped.wait(self._retry_interval)
+            starttime = current_time()
+            continue
+          outcome = 'failed'
+          if self._on_error != None:
+            try:
+              self._on_error(record['op'], record['args'], ex)
+            except Exception, cbex:
+              log.warning("on_error callback failed - %s" % cbex)
+        self._consumed(record['size'], outcome, current_time() - starttime)
+        break
+    self._close_reader()
+
+  def _sender(self, record):
+    # Returns a function that sends the write through the client
+    args = record['args']
+    location = args.get('location')
+    if location != None:
+      location = createRegion(location)
+    if record['op'] == 'create_object':
+      def send():
+        try:
+          self._client.create_object(args['objectid'], args['feed'], args['name_values'], \
+                                     location, args['time'])
+        except ObjectAlreadyExists:
+          pass
+    elif record['op'] == 'update_attributes':
+      def send():
+        self._client.update_attributes(args['objectid'], args['feed'], args['name_values'])
+    elif record['op'] == 'update_location':
+      def send():
+        self._client.update_location(args['objectid'], args['feed'], location, args['time'], \
+                                     args['name_values'])
+    else:
+      raise ValueError("unknown operation %s" % record['op'])
+    return send
+
+  def _next_record(self):
+    # Returns the next record with its size, or None if there is none yet
+    if self._reader == None:
+      path = self._path(self._read_segment)
+      if not os.path.exists(path):
+        self._wait_for_writes()
+        return None
+      self._reader = open(path, 'rb')
+      self._reader.seek(self._read_offset)
+
+    line = self._read_line()
+    if line.endswith('\n'):
+      return self._parse(line)
+
+    # at the end of the segment, or in the middle of a write
+    self._reader.seek(self._read_offset)
+    self._cond.acquire()
+    try:
+      if self._read_segment >= self._write_segment:
+        self._cond.wait(0.5)
+        return None
+      # the writer may have finished the segment since the read above; now
+      # that it cannot change, read again and only drop a torn last write
+      line = self._read_line()
+      self._reader.seek(self._read_offset)
+      if line.endswith('\n'):
+        return None
+      tail = os.path.getsize(self._path(self._read_segment)) - self._read_offset
+      self._bytes -= tail
+      self._close_reader()
+      os.remove(self._path(self._read_segment))
+      self._read_segment += 1
+      self._read_offset = 0
+      self._save_cursor()
+      self._cond.notifyAll()
+      return None
+    finally:
+      self._cond.release()
+
+  def _read_line(self):
+    return self._reader.readline()
+
+  def _parse(self, line):
+    try:
+      record = json.loads(line)
+      record['size'] = len(line)
+      return record
+    except ValueError:
+      log.warning("skipping a corrupt outbox write in segment %d" % self._read_segment)
+      self._consumed(len(line), None, 0)
+      return None
+
+  def _wait_for_writes(self):
+    self._cond.acquire()
+    try:
+      if self._read_segment < self._write_segment:
+        self._read_segment += 1
+        self._read_offset = 0
+      else:
+        self._cond.wait(0.5)
+    finally:
+      self._cond.release()
+
+  def _consumed(self, size, outcome, elapsed):
+    self._cond.acquire()
+    try:
+      self._read_offset += size
+      self._bytes -= size
+      if outcome != None:
+        self._counts[outcome] += 1
+      self._replay_time += elapsed
+      self._since_cursor += 1
+      if self._since_cursor >= DEFAULT_OUTBOX_CURSOR_EVERY:
+        self._save_cursor()
+      self._cond.notifyAll()
+    finally:
+      self._cond.release()
+
+  def _close_reader(self):
+    if self._reader != None:
+      self._reader.close()
+      self._reader = None
+
+  def _path(self, segment):
+    return os.path.join(self._directory, '%010d.log' % segment)
+
+  def _segments(self):
+    segments = []
+    for name in os.listdir(self._directory):
+      if name.endswith('.log') and name[:-4].isdigit():
+        segments.append(int(name[:-4]))
+    segments.sort()
+    return segments
+
+  def _load_cursor(self):
+    path = os.path.join(self._directory, 'cursor')
+    if not os.path.exists(path):
+      return 0, 0
+    handle = open(path, 'r')
+    try:
+      segment, offset = handle.read().split()
+      return int(segment), int(offset)
+    finally:
+      handle.close()
+
+  def _save_cursor(self):
+    # callers hold the lock; rename so that a crash never leaves a torn file
+    path = os.path.join(self._directory, 'cursor')
+    handle = open(path + '.tmp', 'w')
+    try:
+      handle.write('%d %d\n' % (self._read_segment, self._read_offset))
+    finally:
+      handle.close()
+    os.rename(path + '.tmp', path)
+    self._since_cursor = 0
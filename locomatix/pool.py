@@ -0,0 +1,161 @@
+###############################################################################
+#
+# Copyright 2010 Locomatix, Inc.
+# 
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+# 
+#     http://www.apache.org/licenses/LICENSE-2.0
+# 
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+###############################################################################
+import httplib
+import select
+import sys, time
+import threading
+from defaults import *
+from exceptions import *
+major, minor, micro, releaselevel, serial = sys.version_info
+SUPPORT_TIMEOUT = (major >= 2 and minor >= 6)
+
+class ConnectionPool(object):
+  """A thread-safe pool of persistent connections to a Locomatix server.
+
+  At most size connections are open at any time.  A connection is checked out
+  for the duration of a single request/response cycle and checked back in
+  afterwards, so that many threads can share a handful of TLS sessions.
+  Connections that have been idle for longer than max_idle seconds, or whose
+  socket has been closed by the server, are discarded and replaced on demand."""
+
+  def __init__(self, host, port, timeout=10, size=DEFAULT_POOL_SIZE, \
+                     max_idle=DEFAULT_POOL_MAX_IDLE):
+    """
+    Args:
+      host:     Locomatix Server hostname, required
+      port:     Locomatix Server port, required
+      timeout:  connection timeout of each connection
+      size:     maximum number of open connections
+      max_idle: seconds after which an idle connection is closed"""
+    if size < 1:
+      raise ValueError("connection pool size must be at least 1")
+    self._host = host
+    self._port = port
+    self._timeout = timeout
+    self._size = size
+    self._max_idle = max_idle
+    self._idle = []       # (connection, time of checkin), most recent last
+    self._nopen = 0       # idle + checked out connections
+    self._closed = False
+    self._cond = threading.Condition()
+
+  def size(self):
+    return self._size
+
+  def checkout(self, fresh=False):
+    """Returns an open connection, blocking while all connections are in use.
+    Its reused attribute tells whether it served an earlier request.  With
+    fresh a new connection is opened, closing an idle one if need be."""
+    self._cond.acquire()
+    try:
+      while True:
+        if self._closed:
+          raise ConnectionFailure("connection pool is closed", self._host, self._port)
+        self._evict_idle()
+        if fresh:
+          if self._nopen >= self._size and len(self._idle) > 0:
+            conn, last_used = self._idle.pop(0)
+            self._discard(conn)
+        while not fresh and len(self._idle) > 0:
+          conn, last_used = self._idle.pop()
+          if self._healthy(conn):
+            conn.reused = True
+            return conn
+          self._discard(conn)
+        if self._nopen < self._size:
+          self._nopen += 1
+          break
+        self._cond.wait()
+    finally:
+      self._cond.release()
+
+    # open the new connection outside the lock
+    try:
+      return self._connect()
+    except:
+      self._cond.acquire()
+      try:
+        self._nopen -= 1
+        self._cond.notify()
+      finally:
+        self._cond.release()
+      raise
+
+  def checkin(self, conn, broken=False):
+    """Returns a connection to the pool.  Broken connections are closed."""
+    self._cond.acquire()
+    try:
+      if broken or self._closed:
+        self._discard(conn)
+      else:
+        self._idle.append((conn, time.time()))
+      self._cond.notify()
+    finally:
+      self._cond.release()
+
+  def close(self):
+    """Closes all idle connections.  Connections in use are closed on checkin."""
+    self._cond.acquire()
+    try:
+      self._closed = True
+      while len(self._idle) > 0:
+        conn, last_used = self._idle.pop()
+        self._discard(conn)
+      self._cond.notifyAll()
+    finally:
+      self._cond.release()
+
+  def _evict_idle(self):
+    # the idle list is ordered by checkin time, so stale ones are at the front
+    deadline = time.time() - self._max_idle
+    while len(self._idle) > 0 and self._idle[0][1] < deadline:
+      conn, last_used = self._idle.pop(0)
+      self._discard(conn)
+
+  def _discard(self, conn):
+    self._nopen -= 1
+    try:
+      conn.close()
+    except Exception:
+      pass
+
+  def _healthy(self, conn):
+    # an idle connection should have nothing to read; if the socket is readable
+    # the server has either closed it or sent something we did not ask for
+    if conn.sock is None:
+      return False
+    try:
+      readable, writable, errored = select.select([conn.sock], [], [], 0)
+    except Exception:
+      return False
+    return len(readable) == 0
+
+  def _connect(self):
+    if SUPPORT_TIMEOUT:
+      conn = httplib.HTTPSConnection(self._host, self._port, \
+                                     timeout=self._timeout)
+    else:
+      conn = httplib.HTTPSConnection(self._host, self._port)
+
+    try:
+      conn.connect()
+    except Exception, ex:
+      raise ConnectionFailure(ex, self._host, self._port)
+
+    conn.reused = False
+    return conn # the connection was successful
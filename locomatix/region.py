@@ -15,8 +15,29 @@
 # limitations under the License.
 #
 ###############################################################################
+import math
 from objects import PrintableAttributes
 
+EARTH_RADIUS = 6371000.0 # meters
+
+def distance(lat1, long1, lat2, long2):
+  """Returns the great-circle distance in meters between two points."""
+  phi1, phi2 = math.radians(lat1), math.radians(lat2)
+  dphi = phi2 - phi1
+  dlambda = math.radians(long2 - long1)
+  a = math.sin(dphi / 2) ** 2 + \
+      math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2) ** 2
+  return 2 * EARTH_RADIUS * math.asin(min(1.0, math.sqrt(a)))
+
+def bearing(lat1, long1, lat2, long2):
+  """Returns the initial bearing in degrees (0-360) from the first point to the second."""
+  phi1, phi2 = math.radians(lat1), math.radians(lat2)
+  dlambda = math.radians(long2 - long1)
+  y = math.sin(dlambda) * math.cos(phi2)
+  x = math.cos(phi1) * math.sin(phi2) - \
+      math.sin(phi1) * math.cos(phi2) * math.cos(dlambda)
+  return math.degrees(math.atan2(y, x)) % 360.0
+
 class LocomatixRegion(PrintableAttributes):
   """An abstract region object from which all regions will be derived."""
   def __init__(self, rtype, params):
@@ -73,6 +94,31 @@ class Polygon(LocomatixRegion):
 
     return params
 
+  def bounding_box(self):
+    """Returns the smallest Rectangle that contains the polygon"""
+    lats = [float(pt[0]) for pt in self.points]
+    longs = [float(pt[1]) for pt in self.points]
+    return Rectangle(min(lats), min(longs), max(lats), max(longs))
+
+  def bounding_boxes(self):
+    """Returns a list of Rectangles that together contain the polygon"""
+    return [self.bounding_box()]
+
+  def contains(self, latitude, longitude):
+    """Tells whether a point lies inside the polygon (even-odd rule)"""
+    inside = False
+    pts = [(float(pt[0]), float(pt[1])) for pt in self.points]
+    j = len(pts) - 1
+    for i in range(len(pts)):
+      lat_i, long_i = pts[i]
+      lat_j, long_j = pts[j]
+      if (long_i > longitude) != (long_j > longitude):
+        crossing = lat_i + (longitude - long_i) * (lat_j - lat_i) / (long_j - long_i)
+        if latitude < crossing:
+          inside = not inside
+      j = i
+    return inside
+
 class Rectangle(Polygon):
   """A bounding box object that takes south west corner and north east corner"""
   def __init__(self, sw_lat, sw_long, ne_lat, ne_long):
@@ -100,6 +146,32 @@ class Rectangle(Polygon):
 
     return params
 
+  def bounding_box(self):
+    return self
+
+  def bounding_boxes(self):
+    return [self]
+
+  def contains(self, latitude, longitude):
+    latitude, longitude = float(latitude), float(longitude)
+    return float(self.sw_lat) <= latitude <= float(self.ne_lat) and \
+           float(self.sw_long) <= longitude <= float(self.ne_long)
+
+  def tiles(self, nrows, ncols):
+    """Splits the rectangle into a grid of nrows x ncols rectangles, row by row"""
+    lats = _edges(float(self.sw_lat), float(self.ne_lat), nrows)
+    longs = _edges(float(self.sw_long), float(self.ne_long), ncols)
+    tiles = []
+    for row in range(nrows):
+      for col in range(ncols):
+        tiles.append(Rectangle(lats[row], longs[col], lats[row + 1], longs[col + 1]))
+    return tiles
+
+def _edges(low, high, n):
+  # every edge is computed from its index, so that neighbouring tiles share
+  # it exactly, and the last one is high itself
+  return [low + i * (high - low) / n for i in range(n)] + [high]
+
 class Circle(LocomatixRegion):
   """An circle region object. A circle can be specified in two ways
      Absolute --- takes in center latitude, longitude and radius
@@ -152,6 +224,43 @@ class Circle(LocomatixRegion):
 
     return params
 
+  def bounding_box(self):
+    """Returns a Rectangle that contains the (absolute) circle; it spans every
+    longitude if the circle crosses the antimeridian or covers a pole"""
+    boxes = self.bounding_boxes()
+    if len(boxes) == 1:
+      return boxes[0]
+    return Rectangle(boxes[0].sw_lat, -180.0, boxes[0].ne_lat, 180.0)
+
+  def bounding_boxes(self):
+    """Returns a list of Rectangles that together contain the (absolute)
+    circle, split in two where it crosses the antimeridian"""
+    if 'latitude' not in self.__dict__:
+      raise ValueError("a relative circle has no location")
+    lat, lng, radius = float(self.latitude), float(self.longitude), float(self.radius)
+    dlat = math.degrees(radius / EARTH_RADIUS)
+    sw_lat, ne_lat = max(-90.0, lat - dlat), min(90.0, lat + dlat)
+    coslat = math.cos(math.radians(lat))
+    if sw_lat <= -90.0 or ne_lat >= 90.0 or coslat <= 0 or dlat / coslat >= 180.0:
+      # around a pole every longitude is within reach
+      return [Rectangle(sw_lat, -180.0, ne_lat, 180.0)]
+    west, east = lng - dlat / coslat, lng + dlat / coslat
+    if west < -180.0:
+      return [Rectangle(sw_lat, west + 360.0, ne_lat, 180.0), Rectangle(sw_lat, -180.0, ne_lat, east)]
+    if east > 180.0:
+      return [Rectangle(sw_lat, west, ne_lat, 180.0), Rectangle(sw_lat, -180.0, ne_lat, east - 360.0)]
+    return [Rectangle(sw_lat, west, ne_lat, east)]
+
+  def contains(self, latitude, longitude):
+    """Tells whether a point lies within radius meters of the (absolute) circle's center"""
+    if 'latitude' not in self.__dict__:
+      raise ValueError("a relative circle has no location")
+    return distance(float(self.latitude), float(self.longitude), \
+                    latitude, longitude) <= float(self.radius)
+
+# the whole surface of the earth
+WORLD = Rectangle(-90.0, -180.0, 90.0, 180.0)
+
 def createRegion(params):
   ''' Create an instance of the appropriate region provided a map'''
   if params['type'] == 'Point':
@@ -21,7 +21,27 @@ from callback import *
 from keys import *
 from exceptions import *
 
+NAN = float('nan')
+
+def ConvertNVPairs(jsonarray):
+  rnvpairs = dict()
+  for nvpairs in jsonarray:
+    for name, value in nvpairs.iteritems():
+      if name in rnvpairs and isinstance(rnvpairs[name], list):
+        rnvpairs[name].append(value)
+      elif name in rnvpairs:
+        rnvpairs[name] = [rnvpairs[name], value]
+      else:
+        rnvpairs[name] = value
+  return rnvpairs
+
 class LxResponseHandler(object):
+  """Fills the results of a response from its decoded JSON body.
+
+  Handlers of paginated results also have handle_row(row).  When a response
+  is streamed, the rows of Result.Objects are passed to handle_row as they
+  are read, and handle(data) is then called with a body that has no
+  Result.Objects."""
   def __init__(self):
     self.message = ''
     self.response_time = 0.0
@@ -31,16 +51,7 @@ class LxResponseHandler(object):
     self.response_time = data['ExecutionTime']
 
   def convertnvpairs(self, jsonarray):
-    rnvpairs = dict()
-    for nvpairs in jsonarray:
-      for name, value in nvpairs.iteritems():
-        if name in rnvpairs and isinstance(rnvpairs[name], list):
-          rnvpairs[name].append(value)
-        elif name in rnvpairs:
-          rnvpairs[name] = [rnvpairs[name], value]
-        else:
-          rnvpairs[name] = value
-    return rnvpairs
+    return ConvertNVPairs(jsonarray)
 
   def createCallback(self, atype, params): 
     if atype == 'URL':
@@ -130,6 +141,38 @@ def HandleAggregates(data):
 
   return [aggrs] if aggrs_found else []
 
+def BuildObject(robject, projection=None):
+  obj = LxObject()
+  obj.feed = robject['Feed']
+  obj.objectid = robject['ObjectID']
+  if projection == None and robject.get('ObjectNameValues'):
+    obj.name_values = ConvertNVPairs(robject['ObjectNameValues'])
+  return obj
+
+def BuildObjectLocation(robject, projection=None):
+  objloc = LxObjectLocation()
+
+  objloc.feed = robject['Feed']
+  objloc.objectid = robject['ObjectID']
+  if projection != PROJECT_IDS:
+    if 'Longitude' in robject:
+      objloc.longitude = robject['Longitude']
+
+    if 'Latitude' in robject:
+      objloc.latitude = robject['Latitude']
+
+    if 'Time' in robject:
+      objloc.time = int(robject['Time'])
+
+  if projection == None:
+    if robject.get('ObjectNameValues'):
+      objloc.name_values = ConvertNVPairs(robject['ObjectNameValues'])
+
+    if robject.get('LocationNameValues'):
+      objloc.lname_values = ConvertNVPairs(robject['LocationNameValues'])
+
+  return objloc
+
 class StatusResponseHandler(LxResponseHandler):
   """Behaves exactly as the base response handler."""
   pass
@@ -168,6 +211,10 @@ class ListObjectsResponseHandler(LxResponseHandler):
     self.objects = []
     self.aggrs = []
     self.next_key = None
+    self.rows = []
+
+  def handle_row(self, robject):
+    self.rows.append(robject)
 
   def handle(self, data):
     super(ListObjectsResponseHandler, self).handle(data)
@@ -176,12 +223,8 @@ class ListObjectsResponseHandler(LxResponseHandler):
     self.aggrs = HandleAggregates(data)
     if len(self.aggrs) > 0: return
 
-    for robject in data['Result']['Objects']:
-      obj = LxObject()
-      obj.feed = robject['Feed']
-      obj.objectid = robject['ObjectID']
-      obj.name_values = self.convertnvpairs(robject.get('ObjectNameValues', []))
-      self.objects.append(obj)
+    self.rows.extend(data['Result'].get('Objects', []))
+    self.objects = LxRows(self.rows, BuildObject)
 
 class GetLocationResponseHandler(LxResponseHandler):
   def __init__(self):
@@ -204,6 +247,10 @@ class SearchResponseHandler(LxResponseHandler):
     self.objlocs = []
     self.aggrs = []
     self.next_key = None
+    self.rows = []
+
+  def handle_row(self, robject):
+    self.rows.append(robject)
 
   def handle(self, data):
     super(SearchResponseHandler, self).handle(data)
@@ -212,31 +259,9 @@ class SearchResponseHandler(LxResponseHandler):
     self.aggrs = HandleAggregates(data)
     if len(self.aggrs) > 0: return
 
-    for robject in data['Result']['Objects']:
-      objloc = LxObjectLocation()
-
-      objloc.feed = robject['Feed']
-      objloc.objectid = robject['ObjectID']
-
-      if 'ObjectNameValues' in robject:
-        nvpairs = robject.get('ObjectNameValues', [])
-        objloc.name_values = self.convertnvpairs(nvpairs)
-
-      if 'Longitude' in robject:
-        objloc.longitude = robject['Longitude']
-
-      if 'Latitude' in robject:
-        objloc.latitude = robject['Latitude']
+    self.rows.extend(data['Result'].get('Objects', []))
+    self.objlocs = LxRows(self.rows, BuildObjectLocation)
 
-      if 'Time' in robject:
-        objloc.time = int(robject['Time'])
-
-      if 'LocationNameValues' in robject:
-        nvpairs = robject.get('LocationNameValues', [])
-        objloc.lname_values = self.convertnvpairs(nvpairs)
-
-      self.objlocs.append(objloc)
-   
 
 class GetZoneResponseHandler(LxResponseHandler):
   def __init__(self):
@@ -285,6 +310,22 @@ class GetLocationHistoryResponseHandler(LxResponseHandler):
     self.aggrs = []
     self.next_key = None
 
+  def handle_row(self, rlocation):
+    location = LxLocation()
+
+    if 'Longitude' in rlocation:
+      location.longitude = float(rlocation['Longitude'])
+
+    if 'Latitude' in rlocation:
+      location.latitude = float(rlocation['Latitude'])
+
+    if 'Time' in rlocation:
+      location.time = int(rlocation['Time'])
+
+    if rlocation.get('LocationNameValues'):
+      location.lname_values = self.convertnvpairs(rlocation['LocationNameValues'])
+    self.locations.append(location)
+
   def handle(self, data):
     super(GetLocationHistoryResponseHandler, self).handle(data)
     self.next_key = data['Result'].get('NextKey')
@@ -292,20 +333,8 @@ class GetLocationHistoryResponseHandler(LxResponseHandler):
     self.aggrs = HandleAggregates(data)
     if len(self.aggrs) > 0: return
 
-    for rlocation in data['Result']['Objects']:
-      location = LxLocation()
-
-      if 'Longitude' in rlocation:
-        location.longitude = float(rlocation['Longitude'])
-
-      if 'Latitude' in rlocation:
-        location.latitude = float(rlocation['Latitude'])
-
-      if 'Time' in rlocation:
-        location.time = int(rlocation['Time'])
-
-      location.lname_values = self.convertnvpairs(rlocation.get('LocationNameValues', []))
-      self.locations.append(location)
+    for rlocation in data['Result'].get('Objects', []):
+      self.handle_row(rlocation)
     
 class GetSpaceActivityResponseHandler(LxResponseHandler):
   def __init__(self):
@@ -314,6 +343,24 @@ class GetSpaceActivityResponseHandler(LxResponseHandler):
     self.aggrs = []
     self.next_key = None
 
+  def handle_row(self, robject):
+    objloc = LxObjectLocation()
+    objloc.feed = robject['Feed']
+    objloc.objectid = robject['ObjectID']
+
+    if 'Longitude' in robject:
+      objloc.longitude = float(robject['Longitude'])
+
+    if 'Latitude' in robject:
+      objloc.latitude = float(robject['Latitude'])
+
+    if 'Time' in robject:
+      objloc.time = int(robject['Time'])
+
+    if robject.get('LocationNameValues'):
+      objloc.lname_values = self.convertnvpairs(robject['LocationNameValues'])
+    self.objlocs.append(objloc)
+
   def handle(self, data):
     super(GetSpaceActivityResponseHandler, self).handle(data)
     self.next_key = data['Result'].get('NextKey')
@@ -321,22 +368,50 @@ class GetSpaceActivityResponseHandler(LxResponseHandler):
     self.aggrs = HandleAggregates(data)
     if len(self.aggrs) > 0: return
 
-    for robject in data['Result']['Objects']:
-      objloc = LxObjectLocation()
-      objloc.feed = robject['Feed']
-      objloc.objectid = robject['ObjectID']
+    for robject in data['Result'].get('Objects', []):
+      self.handle_row(robject)
+
+class LocationColumnsResponseHandler(LxResponseHandler):
+  """Builds a page of location history or space activity as an LxColumns,
+  a column at a time, without an object per location."""
+  def __init__(self):
+    LxResponseHandler.__init__(self)
+    self.columns = LxColumns()
+    self.aggrs = []
+    self.next_key = None
 
-      if 'Longitude' in robject:
-        objloc.longitude = float(robject['Longitude'])
+  def handle_row(self, row):
+    columns = self.columns
+    if len(columns) == 0 and 'ObjectID' in row:
+      columns.objectids, columns.feeds = [], []
+    if row.get('LocationNameValues'):
+      columns.lname_values[len(columns)] = self.convertnvpairs(row['LocationNameValues'])
+    columns.latitude.append(float(row.get('Latitude', NAN)))
+    columns.longitude.append(float(row.get('Longitude', NAN)))
+    columns.time.append(float(row.get('Time', 0)))
+    if columns.objectids != None:
+      columns.objectids.append(row['ObjectID'])
+      columns.feeds.append(row.get('Feed'))
 
-      if 'Latitude' in robject:
-        objloc.latitude = float(robject['Latitude'])
+  def handle(self, data):
+    super(LocationColumnsResponseHandler, self).handle(data)
+    self.next_key = data['Result'].get('NextKey')
 
-      if 'Time' in robject:
-        objloc.time = int(robject['Time'])
+    self.aggrs = HandleAggregates(data)
+    if len(self.aggrs) > 0: return
 
-      objloc.lname_values = self.convertnvpairs(robject.get('LocationNameValues', []))
-      self.objlocs.append(objloc)
+    # streamed rows were added one at a time by handle_row
+    rows = data['Result'].get('Objects', [])
+    columns = self.columns
+    columns.latitude.fromlist([float(row.get('Latitude', NAN)) for row in rows])
+    columns.longitude.fromlist([float(row.get('Longitude', NAN)) for row in rows])
+    columns.time.fromlist([float(row.get('Time', 0)) for row in rows])
+    if len(rows) > 0 and 'ObjectID' in rows[0]:
+      columns.objectids = [row['ObjectID'] for row in rows]
+      columns.feeds = [row.get('Feed') for row in rows]
+    for i in xrange(len(rows)):
+      if rows[i].get('LocationNameValues'):
+        columns.lname_values[i] = self.convertnvpairs(rows[i]['LocationNameValues'])
 
 class GetHistogramResponseHandler(LxResponseHandler):
   def __init__(self):
@@ -17,7 +17,8 @@
 ###############################################################################
 
 import time
-from objects import PrintableAttributes
+from array import array
+from objects import LazyDict, PrintableAttributes
 from region import createRegion
 from callback import createCallback
 
@@ -39,7 +40,7 @@ class LxFeed(PrintableAttributes):
   def __str__(self):
     """Returns a json-like representation of the object"""
     params = dict()
-    for key, value in self.__dict__.items():
+    for key, value in self._attributes():
       if value == None: continue
       params[key] = value
     return str(params)
@@ -61,15 +62,17 @@ class LxFeed(PrintableAttributes):
 
 class LxObject(PrintableAttributes):
   """Represents a locomatix object."""
+  __slots__ = ('objectid', 'feed', '_name_values')
+  name_values = LazyDict('name_values')
+
   def __init__(self):
     self.objectid = None
     self.feed = None
-    self.name_values = dict()
 
   def __str__(self):
     """Returns a json-like representation of the object"""
     params = dict()
-    for key, value in self.__dict__.items():
+    for key, value in self._attributes():
       if value == None: continue
       if key != 'feed': 
         params[key] = value
@@ -91,16 +94,18 @@ class LxObject(PrintableAttributes):
 
 class LxLocation(PrintableAttributes):
   """Represents a locomatix location."""
+  __slots__ = ('longitude', 'latitude', 'time', '_lname_values')
+  lname_values = LazyDict('lname_values')
+
   def __init__(self):
     self.longitude = None
     self.latitude = None
     self.time = None
-    self.lname_values = dict()
 
   def __str__(self):
     """Returns a json-like representation of the object"""
     params = dict()
-    for key, value in self.__dict__.items():
+    for key, value in self._attributes():
       if value == None: continue
       if key == 'time':
         t = time.gmtime(int(value))
@@ -127,20 +132,22 @@ class LxLocation(PrintableAttributes):
 
 class LxObjectLocation(PrintableAttributes):
   """Represents a locomatix object and its location."""
+  __slots__ = ('objectid', 'feed', '_name_values', 'longitude', 'latitude', 'time', '_lname_values')
+  name_values = LazyDict('name_values')
+  lname_values = LazyDict('lname_values')
+
   def __init__(self):
     self.objectid = None
     self.feed = None
-    self.name_values = dict()
 
     self.longitude = None
     self.latitude = None
     self.time = None
-    self.lname_values = dict()
 
   def __str__(self):
     """Returns a json-like representation of the object"""
     params = dict()
-    for key, value in self.__dict__.items():
+    for key, value in self._attributes():
       if value == None: continue
       if key == 'time':
         t = time.gmtime(int(value))
@@ -254,6 +261,8 @@ class LxZone(PrintableAttributes):
 
 class LxAggregate(PrintableAttributes):
   """Represents a locomatix object and its location."""
+  __slots__ = ('feed', 'count', 'sum', 'max', 'min')
+
   def __init__(self):
     self.feed = None
     self.count = None
@@ -264,11 +273,133 @@ class LxAggregate(PrintableAttributes):
   def __str__(self):
     """Returns a json-like representation of the object"""
     params = dict()
-    for key, value in self.__dict__.items():
+    for key, value in self._attributes():
       if value == None: continue
       params[key] = value
     return str(params)
 
+class LxColumns(PrintableAttributes):
+  """Represents locations column by column: the latitude and longitude of the
+  i-th location are latitude[i] and longitude[i], its time is time[i].
+
+  The columns are typed arrays of doubles (array('d')), missing coordinates
+  are NaN and a missing time is 0.  Times are seconds since the epoch, held
+  exactly as doubles; array('l') is only 32 bits wide on some platforms and
+  array('q') is not available in every Python.  Space activity also fills
+  objectids and feeds, which are None for a location history.  Location
+  name-values are kept in the side table lname_values, by row, for the rows
+  that have any."""
+  __slots__ = ('latitude', 'longitude', 'time', 'objectids', 'feeds', 'lname_values')
+
+  def __init__(self):
+    self.latitude = array('d')
+    self.longitude = array('d')
+    self.time = array('d')
+    self.objectids = None
+    self.feeds = None
+    self.lname_values = dict()
+
+  def __len__(self):
+    return len(self.time)
+
+  def __str__(self):
+    return str({ 'rows': len(self), 'lname_values': len(self.lname_values) })
+
+  def extend(self, other):
+    """Appends the rows of another LxColumns."""
+    offset = len(self)
+    self.latitude.extend(other.latitude)
+    self.longitude.extend(other.longitude)
+    self.time.extend(other.time)
+    if other.objectids != None:
+      if self.objectids == None:
+        self.objectids, self.feeds = [None] * offset, [None] * offset
+      self.objectids.extend(other.objectids)
+      self.feeds.extend(other.feeds)
+    elif self.objectids != None:
+      self.objectids.extend([None] * len(other))
+      self.feeds.extend([None] * len(other))
+    for row, name_values in other.lname_values.iteritems():
+      self.lname_values[offset + row] = name_values
+
+  def row(self, i):
+    """Returns the i-th location as an LxLocation, or an LxObjectLocation for
+    space activity."""
+    if self.objectids == None:
+      location = LxLocation()
+    else:
+      location = LxObjectLocation()
+      location.objectid = self.objectids[i]
+      location.feed = self.feeds[i]
+    location.latitude = self.latitude[i]
+    location.longitude = self.longitude[i]
+    location.time = int(self.time[i])
+    if i in self.lname_values:
+      location.lname_values = self.lname_values[i]
+    return location
+
+  def to_numpy(self):
+    """Returns the latitude, longitude and time columns as NumPy arrays that
+    share memory with the typed arrays.  Requires NumPy."""
+    import numpy
+    return tuple([numpy.frombuffer(column, dtype=column.typecode) \
+                    for column in (self.latitude, self.longitude, self.time)])
+
+def concatenate_columns(pages):
+  """Returns a single LxColumns holding the rows of an iterable of LxColumns."""
+  columns = LxColumns()
+  for page in pages:
+    columns.extend(page)
+  return columns
+
+PROJECT_IDS = 'ids'
+PROJECT_LOCATIONS = 'locations'
+PROJECTIONS = (None, PROJECT_IDS, PROJECT_LOCATIONS)
+
+class LxRows(object):
+  """A page of results that keeps the decoded rows of the response and
+  builds a result object only when a row is indexed or iterated.  A row is
+  built at most once.
+
+  With a projection the objects carry only part of their row, and
+  name-values are not converted at all:
+    PROJECT_IDS - feed and objectid
+    PROJECT_LOCATIONS - feed, objectid, latitude, longitude and time"""
+  __slots__ = ('_rows', '_build', '_projection', '_built')
+
+  def __init__(self, rows, build, projection=None):
+    if projection not in PROJECTIONS:
+      raise ValueError("unknown projection %r" % (projection,))
+    self._rows = rows
+    self._build = build
+    self._projection = projection
+    self._built = [None] * len(rows)
+
+  def __len__(self):
+    return len(self._rows)
+
+  def __getitem__(self, i):
+    if isinstance(i, slice):
+      return [self[j] for j in xrange(*i.indices(len(self._rows)))]
+    result = self._built[i]
+    if result is None:
+      result = self._build(self._rows[i], self._projection)
+      self._built[i] = result
+    return result
+
+  def __iter__(self):
+    for i in xrange(len(self._rows)):
+      yield self[i]
+
+  def __str__(self):
+    return '\n'.join(['%s' % result for result in self])
+
+  def project(self, projection):
+    """Returns the same rows, built with the given projection."""
+    if projection == self._projection:
+      return self
+    return LxRows(self._rows, self._build, projection)
+
 class LxGridAggregates(PrintableAttributes):
   """Represents a locomatix grid aggregates."""
   def __init__(self):
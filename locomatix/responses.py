@@ -18,6 +18,7 @@
 import httplib
 from response_handlers import *
 from exceptions import *
+from stream import ResultStream
 try: import simplejson as json
 except ImportError: 
   try: import json
@@ -32,23 +33,39 @@ class LocomatixResponse(object):
   will try to parse the XML using a handler specific to the request type.  Instance variables
   for the specific response type will be set using the handler results.  Descendant Responses
   need only designate a HANDLER class attribute, then do any relevant instance var assigning
-  as necessary in their constructor."""
+  as necessary in their constructor.
+
+  With stream, and a handler that takes rows one at a time (handle_row), the body is parsed
+  as it is read and the rows of Result.Objects go straight to the handler; body is then
+  the decoded body without Result.Objects."""
   HANDLER = None
-  def __init__(self, http_response):
+  def __init__(self, http_response, stream=False):
     self.status = http_response.status
-    self.body = http_response.read()
     self.handler = self.__class__.HANDLER.__class__()
     self.request_signature = None
     self.response_meta = LxResponseMetadata()
 
+    self.nrows = 0   # rows in Result.Objects
     if self.status >= httplib.OK:
-      data = json.loads(self.body)
+      if stream and hasattr(self.handler, 'handle_row'):
+        parser = ResultStream(http_response)
+        data = parser.parse(self.handler.handle_row)
+        self.body_size = parser.size
+        self.nrows = parser.rows
+      else:
+        body = http_response.read()
+        self.body_size = len(body)
+        data = json.loads(body)
+        if isinstance(data.get('Result'), dict):
+          self.nrows = len(data['Result'].get('Objects', []))
       self.response_meta.message = data['Status']
       self.response_meta.response_time = data['ExecutionTime']
       if self.response_meta.message == 'Success':
         self.handler.handle(data)
       self.body = data
     else:
+      self.body = http_response.read()
+      self.body_size = len(self.body)
       self.response_meta.message = http_response.reason
 
   def get_metadata(self):
@@ -62,8 +79,8 @@ class DeleteFeedResponse(LocomatixResponse):
 
 class ListFeedsResponse(LocomatixResponse):
   HANDLER = ListFeedsResponseHandler()
-  def __init__(self, http_response):
-    super(ListFeedsResponse, self).__init__(http_response)
+  def __init__(self, http_response, stream=False):
+    super(ListFeedsResponse, self).__init__(http_response, stream)
     if self.response_meta.message == 'Success':
        self.next_key = self.handler.next_key
        self.feeds = self.handler.feeds
@@ -81,8 +98,8 @@ class DeleteObjectResponse(LocomatixResponse):
 
 class ListObjectsResponse(LocomatixResponse):
   HANDLER = ListObjectsResponseHandler()
-  def __init__(self, http_response):
-    super(ListObjectsResponse, self).__init__(http_response)
+  def __init__(self, http_response, stream=False):
+    super(ListObjectsResponse, self).__init__(http_response, stream)
     if self.response_meta.message == 'Success':
        self.next_key = self.handler.next_key
        self.objects = self.handler.objects
@@ -95,8 +112,8 @@ class ListObjectsResponse(LocomatixResponse):
 
 class GetAttributesResponse(LocomatixResponse):
   HANDLER = GetAttributesResponseHandler()
-  def __init__(self, http_response):
-    super(GetAttributesResponse, self).__init__(http_response)
+  def __init__(self, http_response, stream=False):
+    super(GetAttributesResponse, self).__init__(http_response, stream)
     if self.response_meta.message == 'Success':
        self.object = self.handler.object
     else:
@@ -113,8 +130,8 @@ class UpdateLocationResponse(LocomatixResponse):
 
 class GetLocationResponse(LocomatixResponse):
   HANDLER = GetLocationResponseHandler()
-  def __init__(self, http_response):
-    super(GetLocationResponse, self).__init__(http_response)
+  def __init__(self, http_response, stream=False):
+    super(GetLocationResponse, self).__init__(http_response, stream)
     if self.response_meta.message == 'Success':
        self.location = self.handler.location
     else:
@@ -123,8 +140,8 @@ class GetLocationResponse(LocomatixResponse):
 
 class SearchNearbyResponse(LocomatixResponse):
   HANDLER = SearchResponseHandler()
-  def __init__(self, http_response):
-    super(SearchNearbyResponse, self).__init__(http_response)
+  def __init__(self, http_response, stream=False):
+    super(SearchNearbyResponse, self).__init__(http_response, stream)
     if self.response_meta.message == 'Success':
        self.objlocs = self.handler.objlocs
        self.aggrs = self.handler.aggrs
@@ -137,8 +154,8 @@ class SearchNearbyResponse(LocomatixResponse):
 
 class SearchRegionResponse(LocomatixResponse):
   HANDLER = SearchResponseHandler()
-  def __init__(self, http_response):
-    super(SearchRegionResponse, self).__init__(http_response)
+  def __init__(self, http_response, stream=False):
+    super(SearchRegionResponse, self).__init__(http_response, stream)
     if self.response_meta.message == 'Success':
        self.objlocs = self.handler.objlocs
        self.aggrs = self.handler.aggrs
@@ -159,8 +176,8 @@ class ActivateZoneResponse(LocomatixResponse):
 
 class GetZoneResponse(LocomatixResponse):
   HANDLER = GetZoneResponseHandler()
-  def __init__(self, http_response):
-    super(GetZoneResponse, self).__init__(http_response)
+  def __init__(self, http_response, stream=False):
+    super(GetZoneResponse, self).__init__(http_response, stream)
     if self.response_meta.message == 'Success':
        self.zone  = self.handler.zone
     else:
@@ -169,8 +186,8 @@ class GetZoneResponse(LocomatixResponse):
 
 class ListZonesResponse(LocomatixResponse):
   HANDLER = ListZonesResponseHandler()
-  def __init__(self, http_response):
-    super(ListZonesResponse, self).__init__(http_response)
+  def __init__(self, http_response, stream=False):
+    super(ListZonesResponse, self).__init__(http_response, stream)
     if self.response_meta.message == 'Success':
        self.next_key = self.handler.next_key
        self.zones  = self.handler.zones
@@ -197,8 +214,8 @@ class ActivateFenceResponse(LocomatixResponse):
 
 class GetFenceResponse(LocomatixResponse):
   HANDLER = GetFenceResponseHandler()
-  def __init__(self, http_response):
-    super(GetFenceResponse, self).__init__(http_response)
+  def __init__(self, http_response, stream=False):
+    super(GetFenceResponse, self).__init__(http_response, stream)
     if self.response_meta.message == 'Success':
        self.fence  = self.handler.fence
     else:
@@ -207,8 +224,8 @@ class GetFenceResponse(LocomatixResponse):
 
 class ListFencesResponse(LocomatixResponse):
   HANDLER = ListFencesResponseHandler()
-  def __init__(self, http_response):
-    super(ListFencesResponse, self).__init__(http_response)
+  def __init__(self, http_response, stream=False):
+    super(ListFencesResponse, self).__init__(http_response, stream)
     if self.response_meta.message == 'Success':
        self.next_key = self.handler.next_key
        self.fences = self.handler.fences
@@ -227,8 +244,8 @@ class DeleteFenceResponse(LocomatixResponse):
 
 class GetLocationHistoryResponse(LocomatixResponse):
   HANDLER = GetLocationHistoryResponseHandler()
-  def __init__(self, http_response):
-    super(GetLocationHistoryResponse, self).__init__(http_response)
+  def __init__(self, http_response, stream=False):
+    super(GetLocationHistoryResponse, self).__init__(http_response, stream)
     if self.response_meta.message == 'Success':
        self.locations = self.handler.locations
        self.aggrs = self.handler.aggrs
@@ -241,8 +258,8 @@ class GetLocationHistoryResponse(LocomatixResponse):
 
 class GetSpaceActivityResponse(LocomatixResponse):
   HANDLER = GetSpaceActivityResponseHandler()
-  def __init__(self, http_response):
-    super(GetSpaceActivityResponse, self).__init__(http_response)
+  def __init__(self, http_response, stream=False):
+    super(GetSpaceActivityResponse, self).__init__(http_response, stream)
     if self.response_meta.message == 'Success':
        self.objlocs = self.handler.objlocs
        self.aggrs = self.handler.aggrs
@@ -253,10 +270,24 @@ class GetSpaceActivityResponse(LocomatixResponse):
        self.next_key = None
 
 
+class LocationColumnsResponse(LocomatixResponse):
+  HANDLER = LocationColumnsResponseHandler()
+  def __init__(self, http_response, stream=False):
+    super(LocationColumnsResponse, self).__init__(http_response, stream)
+    if self.response_meta.message == 'Success':
+       self.columns = self.handler.columns
+       self.aggrs = self.handler.aggrs
+       self.next_key = self.handler.next_key
+    else:
+       self.columns = None
+       self.aggrs = None
+       self.next_key = None
+
+
 class GetHistogramResponse(LocomatixResponse):
   HANDLER = GetHistogramResponseHandler()
-  def __init__(self, http_response):
-    super(GetHistogramResponse, self).__init__(http_response)
+  def __init__(self, http_response, stream=False):
+    super(GetHistogramResponse, self).__init__(http_response, stream)
     if self.response_meta.message == 'Success':
        self.grid_aggregates = self.handler.grid_aggregates
     else:
@@ -0,0 +1,120 @@
+###############################################################################
+#
+# Copyright 2010 Locomatix, Inc.
+# 
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+# 
+#     http://www.apache.org/licenses/LICENSE-2.0
+# 
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+###############################################################################
+import random
+import threading
+from defaults import *
+from exceptions import *
+
+# methods that may be sent again after the server has seen them
+IDEMPOTENT_METHODS = ['GET', 'PUT', 'DELETE']
+
+# errors reported by the server that are worth another try
+RETRYABLE_ERRORS = [InternalSystemError]
+
+class RetryPolicy(object):
+  """Decides whether a failed request is tried again and how long to wait.
+
+  A request is attempted at most max_attempts times.  Failures that happen
+  before the request reaches the server (connecting, or writing to a stale
+  connection) are always retried.  Failures after it was sent (no or an
+  unreadable response, a RETRYABLE_ERRORS error or an HTTP 5xx status) are
+  retried only for the IDEMPOTENT_METHODS, since retrying a POST could apply
+  it twice, unless retry_unsafe is set.  Retries back off exponentially from
+  base_delay up to max_delay with full jitter, and none is started that
+  would end after deadline seconds from the first attempt.
+
+  Besides, the client sends a request of any method once more, right away and
+  on a new connection, when a reused connection fails before any response
+  arrives: the server most likely closed it while it was idle.
+
+  Subclasses may override retryable() and delay().  A policy may be shared by
+  several clients; stats() reports what it did."""
+
+  def __init__(self, max_attempts=DEFAULT_RETRY_ATTEMPTS, \
+                     base_delay=DEFAULT_RETRY_BASE_DELAY, \
+                     max_delay=DEFAULT_RETRY_MAX_DELAY, \
+                     deadline=DEFAULT_RETRY_DEADLINE, \
+                     retryable_errors=RETRYABLE_ERRORS, retry_unsafe=False):
+    """
+    Args:
+      max_attempts: No. of times a request is sent at most
+      base_delay: Seconds to wait before the first retry
+      max_delay: Seconds to wait before a retry at most
+      deadline: Seconds after which a request is no longer retried
+      retryable_errors: exception classes of the server errors to retry
+      retry_unsafe: also retry requests that are not idempotent"""
+    if max_attempts < 1:
+      raise ValueError("max_attempts must be at least 1")
+    self.max_attempts = max_attempts
+    self.base_delay = base_delay
+    self.max_delay = max_delay
+    self.deadline = deadline
+    self._retryable_errors = tuple(retryable_errors)
+    self._retry_unsafe = retry_unsafe
+    self._lock = threading.Lock()
+    self._stats = { 'requests': 0, 'retries': 0, 'failures': 0, 'deadlines': 0, 'errors': dict() }
+
+  def retryable(self, method, error, sent, status=None):
+    """Returns True if a request may be sent again after error.
+
+    Args:
+      method: HTTP method of the request
+      error: the exception raised, or the exception class of a server error
+      sent: False if the request never reached the server
+      status: HTTP status of the response, if there was one"""
+    if not sent:
+      return True
+    if method not in IDEMPOTENT_METHODS and not self._retry_unsafe:
+      return False
+    if status == None:
+      return True
+    if isinstance(error, type) and issubclass(error, self._retryable_errors):
+      return True
+    return status >= 500
+
+  def delay(self, attempt):
+    """Returns the seconds to wait before the retry that follows attempt."""
+    return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** (attempt - 1))))
+
+  def stats(self):
+    """Returns the no. of requests, retries, requests that failed after their
+    last attempt, requests stopped by the deadline, and the retries per error."""
+    self._lock.acquire()
+    try:
+      stats = dict(self._stats)
+      stats['errors'] = dict(self._stats['errors'])
+      return stats
+    finally:
+      self._lock.release()
+
+  def record(self, name, error=None):
+    """Counts what a client did with a request, for stats().
+
+    Args:
+      name: 'requests', 'retries', 'failures' or 'deadlines'
+      error: the exception that caused a retry, or its class"""
+    self._lock.acquire()
+    try:
+      self._stats[name] += 1
+      if error != None:
+        if not isinstance(error, type):
+          error = error.__class__
+        errors = self._stats['errors']
+        errors[error.__name__] = errors.get(error.__name__, 0) + 1
+    finally:
+      self._lock.release()
@@ -0,0 +1,148 @@
+###############################################################################
+#
+# Copyright 2010 Locomatix, Inc.
+# 
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+# 
+#     http://www.apache.org/licenses/LICENSE-2.0
+# 
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+###############################################################################
+import codecs
+try: import simplejson as json
+except ImportError: import json
+from defaults import DEFAULT_STREAM_CHUNK_SIZE
+
+WHITESPACE = ' \t\n\r'
+NUMBER = '0123456789+-.eE'
+
+class ResultStream(object):
+  """Parses a JSON response body incrementally, in chunks read from a file
+  object such as an httplib response.
+
+  The rows of Result.Objects are passed to a callback one at a time as they
+  are decoded and are not kept, so the raw body and the whole decoded tree
+  are never in memory together; only the current chunk and row are.  Every
+  other member is decoded as usual with raw_decode."""
+
+  # value returned for a member that was consumed and is left out
+  _SKIPPED = object()
+
+  def __init__(self, fp, chunk_size=DEFAULT_STREAM_CHUNK_SIZE):
+    """
+    Args:
+      fp: file object with the body, required
+      chunk_size: bytes read at a time, optional"""
+    self._fp = fp
+    self._chunk_size = chunk_size
+    self._utf8 = codecs.getincrementaldecoder('utf-8')()
+    self._decoder = json.JSONDecoder()
+    self._buffer = u''
+    self._pos = 0
+    self._eof = False
+    self._handle_row = None
+    self.size = 0   # bytes read
+    self.rows = 0   # rows of Result.Objects passed on
+
+  def parse(self, handle_row):
+    """Reads the whole body, calling handle_row(row) for every row of
+    Result.Objects.
+
+    Return:
+      The decoded body without Result.Objects"""
+    self._handle_row = handle_row
+    data = self._object(self._top_member)
+    if self._peek(False) != None:
+      raise ValueError("unexpected data after the response body")
+    return data
+
+  def _top_member(self, key):
+    if key == 'Result' and self._peek() == '{':
+      return self._object(self._result_member)
+    return self._value()
+
+  def _result_member(self, key):
+    if key != 'Objects' or self._peek() != '[':
+      return self._value()
+    self._pos += 1
+    if self._peek() == ']':
+      self._pos += 1
+      return self._SKIPPED
+    while True:
+      self._handle_row(self._value())
+      self.rows += 1
+      if self._next(',]') == ']':
+        return self._SKIPPED
+
+  def _object(self, member):
+    obj = dict()
+    self._next('{')
+    if self._peek() == '}':
+      self._pos += 1
+      return obj
+    while True:
+      key = self._value()
+      self._next(':')
+      value = member(key)
+      if value is not self._SKIPPED:
+        obj[key] = value
+      if self._next(',}') == '}':
+        return obj
+
+  def _value(self):
+    self._peek()
+    while True:
+      try:
+        value, end = self._decoder.raw_decode(self._buffer, self._pos)
+      except ValueError:
+        if self._eof: raise
+        self._fill()   # the value goes on in the next chunk
+        continue
+      if not self._eof and self._partial(end):
+        self._fill()   # so might a number that ends the chunk
+        continue
+      self._pos = end
+      return value
+
+  def _partial(self, end):
+    # only a number ends without a closing character, and raw_decode stops
+    # at the longest prefix that is a number ('1' of '1.5')
+    while end < len(self._buffer) and self._buffer[end] in NUMBER:
+      end += 1
+    return end == len(self._buffer)
+
+  def _next(self, expected):
+    c = self._peek()
+    if c not in expected:
+      raise ValueError("expected one of %r in the response body, found %r" % (expected, c))
+    self._pos += 1
+    return c
+
+  def _peek(self, required=True):
+    """Skips whitespace and returns the next character, reading as needed."""
+    while True:
+      while self._pos < len(self._buffer) and self._buffer[self._pos] in WHITESPACE:
+        self._pos += 1
+      if self._pos < len(self._buffer):
+        return self._buffer[self._pos]
+      if self._eof:
+        if required:
+          raise ValueError("the response body ended unexpectedly")
+        return None
+      self._fill()
+
+  def _fill(self):
+    chunk = self._fp.read(self._chunk_size)
+    self.size += len(chunk)
+    if not chunk:
+      self._eof = True
+    text = self._utf8.decode(chunk, self._eof)
+    self._buffer = self._buffer[self._pos:] + text
+    self._pos = 0
@@ -0,0 +1,161 @@
+###############################################################################
+#
+# Copyright 2010 Locomatix, Inc.
+# 
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+# 
+#     http://www.apache.org/licenses/LICENSE-2.0
+# 
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+###############################################################################
+"""An in-memory stand-in for the Locomatix REST API, served over plain HTTP
+on a local port.  It knows feeds, objects, their attributes and locations,
+and pages ListObjects results; any other request simply succeeds."""
+import BaseHTTPServer
+import SocketServer
+import httplib
+import threading
+import urlparse
+
+try: import simplejson as json
+except ImportError: import json
+
+class StandInServer(SocketServer.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+  daemon_threads = True
+
+  def __init__(self):
+    BaseHTTPServer.HTTPServer.__init__(self, ('127.0.0.1', 0), StandInHandler)
+    self.lock = threading.Lock()
+    self.objects = {}     # (feed, objectid) -> name values
+    self.locations = {}   # (feed, objectid) -> (latitude, longitude, time)
+    self.requests = []    # (method, path) of every request served
+    self.failures = []    # (status, content type, body) answers to give first
+    self._thread = threading.Thread(target=self.serve_forever)
+    self._thread.setDaemon(True)
+    self._thread.start()
+
+  def port(self):
+    return self.server_address[1]
+
+  def fail(self, count, status, body, content_type='text/html'):
+    """Answers the next count requests with the given status and raw body."""
+    self.lock.acquire()
+    try:
+      self.failures.extend([(status, content_type, body)] * count)
+    finally:
+      self.lock.release()
+
+  def stop(self):
+    self.shutdown()
+    self.server_close()
+
+class StandInHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+  protocol_version = 'HTTP/1.1'
+
+  def log_message(self, format, *args):
+    pass
+
+  def do_GET(self):
+    self._serve('GET')
+
+  def do_PUT(self):
+    self._serve('PUT')
+
+  def do_POST(self):
+    self._serve('POST')
+
+  def do_DELETE(self):
+    self._serve('DELETE')
+
+  def _reply_raw(self, status, content_type, data):
+    self.send_response(status)
+    self.send_header('Content-Type', content_type)
+    self.send_header('Content-Length', str(len(data)))
+    self.end_headers()
+    self.wfile.write(data)
+
+  def _reply(self, status, result=None):
+    body = { 'Status': status, 'ExecutionTime': '1' }
+    if result != None:
+      body['Result'] = result
+    self._reply_raw(httplib.OK, 'application/json', json.dumps(body))
+
+  def _serve(self, method):
+    url = urlparse.urlparse(self.path)
+    params = urlparse.parse_qs(url.query)
+    length = int(self.headers.getheader('Content-Length') or 0)
+    if length > 0:
+      params.update(urlparse.parse_qs(self.rfile.read(length)))
+    param = lambda name: params.get(name, [None])[0]
+
+    server = self.server
+    server.lock.acquire()
+    try:
+      server.requests.append((method, url.path))
+      if len(server.failures) > 0:
+        return self._reply_raw(*server.failures.pop(0))
+      parts = url.path.split('/')
+      endpoint = parts[-1]
+      if len(parts) > 3 and parts[1] == 'feed':
+        key = (parts[2], param('oid')) # the feed is part of the uri
+      else:
+        key = (param('feed'), param('oid'))
+      if endpoint == 'Create.json' and url.path.startswith('/feed/') and param('oid') != None:
+        if key in server.objects:
+          return self._reply('ObjectAlreadyExists')
+        server.objects[key] = dict()
+        if param('latitude') != None:
+          server.locations[key] = (float(param('latitude')), float(param('longitude')), \
+                                   int(param('time')))
+        return self._reply('Success')
+      if endpoint in ('GetAttributes.json', 'UpdateAttributes.json', \
+                      'GetLocation.json', 'UpdateLocation.json', 'Delete.json') \
+                      and param('oid') != None and key not in server.objects:
+        return self._reply('ObjectDoesNotExist')
+      if endpoint == 'Delete.json' and param('oid') != None:
+        del server.objects[key]
+        server.locations.pop(key, None)
+        return self._reply('Success')
+      if endpoint == 'UpdateLocation.json':
+        server.locations[key] = (float(param('latitude')), float(param('longitude')), \
+                                 int(param('time')))
+        return self._reply('Success')
+      if endpoint == 'GetLocation.json':
+        if key not in server.locations:
+          return self._reply('ObjectDoesNotHaveLocation')
+        latitude, longitude, time = server.locations[key]
+        return self._reply('Success', { 'Location': { 'Latitude': latitude, \
+                                        'Longitude': longitude, 'Time': time } })
+      if endpoint == 'GetAttributes.json':
+        return self._reply('Success', { 'Object': { 'Feed': key[0], 'ObjectID': key[1], \
+                                        'ObjectNameValues': [] } })
+      if endpoint == 'ListObjects.json':
+        tokens = param('predicate').split()
+        feed = tokens[tokens.index('FROM') + 1]
+        rows = [{ 'Feed': f, 'ObjectID': o, 'ObjectNameValues': [] } \
+                for f, o in sorted(server.objects) if f == feed]
+        start, fetch_size = int(param('startkey') or 0), int(param('fetchsize'))
+        result = { 'Objects': rows[start:start + fetch_size] }
+        if start + fetch_size < len(rows):
+          result['NextKey'] = str(start + fetch_size)
+        return self._reply('Success', result)
+      return self._reply('Success')
+    finally:
+      server.lock.release()
+
+class PlainHTTP(object):
+  """Makes the clients connect over plain HTTP, as the stand-in serves it,
+  until restore() is called."""
+  def __init__(self):
+    self._https = httplib.HTTPSConnection
+    httplib.HTTPSConnection = httplib.HTTPConnection
+
+  def restore(self):
+    httplib.HTTPSConnection = self._https
@@ -0,0 +1,74 @@
+###############################################################################
+#
+# Copyright 2010 Locomatix, Inc.
+# 
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+# 
+#     http://www.apache.org/licenses/LICENSE-2.0
+# 
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+###############################################################################
+import gc
+import time
+import unittest
+import standin
+from locomatix import AsyncClient, LxFuture, ObjectDoesNotExist, Point
+
+class AsyncClientTest(unittest.TestCase):
+  def setUp(self):
+    self.plain = standin.PlainHTTP()
+    self.server = standin.StandInServer()
+    self.client = AsyncClient('cust', 'key', 'secret', '127.0.0.1', self.server.port(), \
+                              workers=4, max_buffered=2)
+
+  def tearDown(self):
+    self.client.close()
+    self.server.stop()
+    self.plain.restore()
+
+  def test_single_requests_return_futures(self):
+    futures = [self.client.create_object_location('o%d' % i, 'cars', Point(1.0, 2.0), i) \
+               for i in xrange(20)]
+    for future in futures:
+      self.assertTrue(isinstance(future, LxFuture))
+      self.assertEqual(future.result(), None)
+    location = self.client.get_location('o7', 'cars').result()
+    self.assertEqual((location.latitude, location.longitude, location.time), (1.0, 2.0, 7))
+
+  def test_exceptions_are_those_of_the_client(self):
+    future = self.client.get_location('missing', 'cars')
+    self.assertRaises(ObjectDoesNotExist, future.result)
+    self.assertTrue(isinstance(future.exception(), ObjectDoesNotExist))
+
+  def test_paged_requests_walk_every_page(self):
+    for i in xrange(45):
+      self.client.create_object('o%02d' % i, 'cars').result()
+    objectids = [obj.objectid for obj in self.client.list_objects('cars', fetch_size=10)]
+    self.assertEqual(objectids, ['o%02d' % i for i in xrange(45)])
+    pages = [path for method, path in self.server.requests if path == '/ListObjects.json']
+    self.assertEqual(len(pages), 5)
+
+  def test_dropped_iterator_stops_fetching(self):
+    for i in xrange(45):
+      self.client.create_object('o%02d' % i, 'cars').result()
+    objects = self.client.list_objects('cars', fetch_size=1)
+    objects.next()
+    threads = objects._producers.threads
+    del objects
+    gc.collect()
+    for thread in threads:
+      thread.join(5)
+      self.assertFalse(thread.isAlive())
+    pages = len(self.server.requests)
+    time.sleep(0.3)
+    self.assertEqual(len(self.server.requests), pages)
+
+if __name__ == '__main__':
+  unittest.main()
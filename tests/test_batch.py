@@ -0,0 +1,69 @@
+###############################################################################
+#
+# Copyright 2010 Locomatix, Inc.
+# 
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+# 
+#     http://www.apache.org/licenses/LICENSE-2.0
+# 
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+###############################################################################
+import random
+import threading
+import time
+import unittest
+from locomatix import LocationBatcher, Point
+
+class SlowClient(object):
+  """Stands in for a Client, taking a random while to send each update."""
+  def __init__(self):
+    self.lock = threading.Lock()
+    self.times = dict()   # objectid -> times in the order they were sent
+
+  def update_location(self, objectid, feed, location, time_, name_values):
+    time.sleep(random.random() * 0.005)
+    self.lock.acquire()
+    try:
+      self.times.setdefault(objectid, []).append(time_)
+    finally:
+      self.lock.release()
+
+class LocationBatcherTest(unittest.TestCase):
+  def test_updates_of_an_object_are_sent_in_order(self):
+    client = SlowClient()
+    batcher = LocationBatcher(client, batch_size=10, max_latency=0.05, senders=4)
+    for t in xrange(200):
+      for objectid in ('a', 'b', 'c'):
+        batcher.add(objectid, 'cars', Point(1.0, 2.0), t)
+    batcher.close()
+    for objectid in ('a', 'b', 'c'):
+      self.assertEqual(client.times[objectid], range(200))
+
+  def test_leftover_updates_keep_their_age(self):
+    client = SlowClient()
+    batcher = LocationBatcher(client, batch_size=2, max_latency=0.5, senders=1)
+    try:
+      start = time.time()
+      # holding the lock keeps the flusher from taking a batch, so the
+      # third update is left over once it does
+      batcher._cond.acquire()
+      try:
+        for objectid in ('a', 'b', 'c'):
+          batcher.add(objectid, 'cars', Point(1.0, 2.0), 1)
+        time.sleep(0.4)
+      finally:
+        batcher._cond.release()
+      time.sleep(0.7 - (time.time() - start))
+      self.assertEqual(batcher.pending(), 0)
+    finally:
+      batcher.close()
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,110 @@
+###############################################################################
+#
+# Copyright 2010 Locomatix, Inc.
+# 
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+# 
+#     http://www.apache.org/licenses/LICENSE-2.0
+# 
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+###############################################################################
+import gc
+import threading
+import unittest
+from locomatix import CancelledError
+from locomatix.futures import BackgroundIterator, MergedIterator, WorkerPool
+
+def stopped(threads, timeout=5):
+  """Waits for the threads and tells whether they have all exited."""
+  for thread in threads:
+    thread.join(timeout)
+  return not any([thread.isAlive() for thread in threads])
+
+class CountingIterable(object):
+  """Yields 0, 1, 2, ... without end and remembers being closed."""
+  def __init__(self):
+    self.closed = False
+
+  def __iter__(self):
+    i = 0
+    while not self.closed:
+      yield i
+      i += 1
+
+  def close(self):
+    self.closed = True
+
+class BackgroundIteratorTest(unittest.TestCase):
+  def test_yields_in_order_and_reraises(self):
+    def numbers():
+      for i in xrange(10):
+        yield i
+      raise KeyError('done')
+    items = BackgroundIterator(numbers(), 3)
+    self.assertEqual([items.next() for i in xrange(10)], range(10))
+    self.assertRaises(KeyError, items.next)
+    self.assertRaises(StopIteration, items.next)
+
+  def test_dropped_iterator_stops_its_producer(self):
+    iterable = CountingIterable()
+    items = BackgroundIterator(iterable, 2)
+    self.assertEqual(items.next(), 0)
+    threads = items._producers.threads
+    del items
+    gc.collect()
+    self.assertTrue(stopped(threads))
+    self.assertTrue(iterable.closed)
+
+class MergedIteratorTest(unittest.TestCase):
+  def test_yields_every_item(self):
+    items = MergedIterator([xrange(i * 10, i * 10 + 10) for i in xrange(5)], 3, 4)
+    self.assertEqual(sorted(items), range(50))
+
+  def test_dropped_iterator_stops_its_producers(self):
+    # more iterables than producers, so some are never taken
+    iterables = [CountingIterable() for i in xrange(5)]
+    items = MergedIterator(iterables, 2, 2)
+    items.next()
+    threads = items._producers.threads
+    del items
+    gc.collect()
+    self.assertTrue(stopped(threads))
+    for iterable in iterables:
+      self.assertTrue(iterable.closed)
+
+  def test_iterables_not_taken_are_closed_on_close(self):
+    iterables = [CountingIterable() for i in xrange(4)]
+    items = MergedIterator(iterables, 1, 1)
+    items.next()
+    items.close()
+    self.assertTrue(stopped(items._producers.threads))
+    for iterable in iterables:
+      self.assertTrue(iterable.closed)
+
+class WorkerPoolTest(unittest.TestCase):
+  def test_cancel_skips_calls_not_started(self):
+    pool = WorkerPool(1)
+    started, release = threading.Event(), threading.Event()
+    def blocking():
+      started.set()
+      release.wait()
+      return 'ran'
+    running = pool.submit(blocking)
+    queued = pool.submit(lambda: 'ran')
+    started.wait()
+    self.assertFalse(running.cancel())
+    self.assertTrue(queued.cancel())
+    release.set()
+    self.assertEqual(running.result(), 'ran')
+    self.assertRaises(CancelledError, queued.result)
+    pool.shutdown()
+
+if __name__ == '__main__':
+  unittest.main()
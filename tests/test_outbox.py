@@ -0,0 +1,135 @@
+###############################################################################
+#
+# Copyright 2010 Locomatix, Inc.
+# 
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+# 
+#     http://www.apache.org/licenses/LICENSE-2.0
+# 
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+###############################################################################
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+import standin
+from locomatix import Client, ObjectDoesNotExist, Outbox
+
+class RecordingClient(object):
+  """Stands in for a Client and records the writes replayed through it."""
+  def __init__(self):
+    self.objectids = []
+
+  def create_object(self, objectid, feed, name_values, location, time):
+    self.objectids.append(objectid)
+
+  def update_attributes(self, objectid, feed, name_values):
+    self.objectids.append(objectid)
+
+class RacingOutbox(Outbox):
+  """Runs race() right after the replay thread reads the end of its segment
+  and before it takes the lock, the window in which a writer may finish the
+  segment and roll over."""
+  race = None
+
+  def _read_line(self):
+    line = Outbox._read_line(self)
+    race, self.race = self.race, None
+    if race != None and not line.endswith('\n'):
+      race()
+    return line
+
+class OutboxTest(unittest.TestCase):
+  def setUp(self):
+    self.directory = tempfile.mkdtemp()
+    self.client = RecordingClient()
+
+  def tearDown(self):
+    shutil.rmtree(self.directory)
+
+  def test_replays_in_order_across_segments(self):
+    outbox = Outbox(self.client, self.directory, segment_size=200, fsync='never')
+    try:
+      for i in xrange(100):
+        outbox.update_attributes('o%d' % i, 'cars', { 'n': i })
+      self.assertTrue(outbox.flush(10))
+      self.assertEqual(outbox.pending_bytes(), 0)
+    finally:
+      outbox.close()
+    self.assertEqual(self.client.objectids, ['o%d' % i for i in xrange(100)])
+
+  def test_write_appended_during_rollover_is_replayed(self):
+    outbox = RacingOutbox(self.client, self.directory, segment_size=1, fsync='never')
+    raced = threading.Event()
+    try:
+      def race():
+        # the first write fills the read segment, the second rolls over
+        outbox.create_object('first', 'cars')
+        outbox.create_object('second', 'cars')
+        raced.set()
+      outbox.race = race
+      raced.wait(10)
+      self.assertTrue(outbox.flush(10))
+      self.assertEqual(outbox.pending_bytes(), 0)
+    finally:
+      outbox.close()
+    self.assertEqual(self.client.objectids, ['first', 'second'])
+
+  def test_torn_write_is_skipped_after_restart(self):
+    outbox = Outbox(RecordingClient(), self.directory, fsync='never')
+    outbox.close()
+    segment = os.path.join(self.directory, sorted(os.listdir(self.directory))[0])
+    handle = open(segment, 'a')
+    handle.write('{"op": "create_object", "args": {"objectid": "whole", "feed": "cars", ' \
+                 '"name_values": {}, "location": null, "time": 0}}\n{"op": "crea')
+    handle.close()
+
+    outbox = Outbox(self.client, self.directory, fsync='never')
+    try:
+      self.assertTrue(outbox.flush(10))
+      self.assertEqual(outbox.pending_bytes(), 0)
+    finally:
+      outbox.close()
+    self.assertEqual(self.client.objectids, ['whole'])
+
+class OutboxServerTest(unittest.TestCase):
+  def setUp(self):
+    self.directory = tempfile.mkdtemp()
+    self.plain = standin.PlainHTTP()
+    self.server = standin.StandInServer()
+    self.client = Client('cust', 'key', 'secret', '127.0.0.1', self.server.port(), retry=1)
+    self.errors = []
+    self.outbox = Outbox(self.client, self.directory, fsync='never', retry_interval=0.05, \
+                         on_error=lambda op, args, ex: self.errors.append((op, ex)))
+
+  def tearDown(self):
+    self.outbox.close()
+    self.client.close()
+    self.server.stop()
+    self.plain.restore()
+    shutil.rmtree(self.directory)
+
+  def test_write_survives_an_outage(self):
+    self.server.fail(3, 503, '<html><body>Service Unavailable</body></html>')
+    self.outbox.create_object('kept', 'cars')
+    self.assertTrue(self.outbox.flush(10))
+    self.assertEqual(self.errors, [])
+    self.assertTrue(('cars', 'kept') in self.server.objects)
+    self.assertTrue(self.outbox.stats()['retries'] >= 3)
+
+  def test_definite_answer_drops_the_write(self):
+    self.outbox.update_attributes('missing', 'cars', { 'n': 1 })
+    self.assertTrue(self.outbox.flush(10))
+    self.assertEqual(len(self.errors), 1)
+    self.assertTrue(isinstance(self.errors[0][1], ObjectDoesNotExist))
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,63 @@
+###############################################################################
+#
+# Copyright 2010 Locomatix, Inc.
+# 
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+# 
+#     http://www.apache.org/licenses/LICENSE-2.0
+# 
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+###############################################################################
+import copy
+import pickle
+import unittest
+from locomatix import LxLocation, LxObject, LxObjectLocation
+from locomatix.response_handlers import GetLocationHistoryResponseHandler, SearchResponseHandler
+
+def page(rows):
+  return { 'Status': 'Success', 'ExecutionTime': '1.0', 'Result': { 'Objects': rows } }
+
+class NameValuesTest(unittest.TestCase):
+  def test_rows_without_name_values_can_be_filled_in(self):
+    handler = SearchResponseHandler()
+    handler.handle(page([{ 'Feed': 'cars', 'ObjectID': 'a', 'Latitude': 1.0, 'Longitude': 2.0 }, \
+                         { 'Feed': 'cars', 'ObjectID': 'b', 'Latitude': 1.0, 'Longitude': 2.0 }]))
+    first, second = list(handler.objlocs)
+    first.name_values['color'] = 'red'
+    first.lname_values['speed'] = '10'
+    self.assertEqual(first.name_values, { 'color': 'red' })
+    self.assertEqual(second.name_values, {})
+    self.assertEqual(second.lname_values, {})
+
+  def test_trail_points_allocate_name_values_only_when_used(self):
+    handler = GetLocationHistoryResponseHandler()
+    handler.handle(page([{ 'Latitude': 1.0, 'Longitude': 2.0, 'Time': 3 }, \
+                         { 'Latitude': 1.0, 'Longitude': 2.0, 'Time': 4, \
+                           'LocationNameValues': [{ 'speed': '10' }] }]))
+    plain, named = handler.locations
+    self.assertEqual(getattr(plain, '_lname_values', None), None)
+    self.assertEqual(named.lname_values, { 'speed': '10' })
+    plain.lname_values['speed'] = '20'
+    self.assertEqual(plain.lname_values, { 'speed': '20' })
+
+  def test_copies_keep_the_name_values(self):
+    objloc = LxObjectLocation()
+    objloc.objectid, objloc.feed = 'a', 'cars'
+    objloc.name_values = { 'color': 'red' }
+    for other in (copy.deepcopy(objloc), pickle.loads(pickle.dumps(objloc))):
+      self.assertEqual(other.name_values, { 'color': 'red' })
+      self.assertEqual(other.lname_values, {})
+      self.assertEqual(other.objectid, 'a')
+    self.assertEqual(objloc.params()['name_values'], { 'color': 'red' })
+    self.assertEqual(LxObject().to_map()['name_values'], {})
+    self.assertEqual(LxLocation().params()['lname_values'], {})
+
+if __name__ == '__main__':
+  unittest.main()
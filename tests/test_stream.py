@@ -0,0 +1,100 @@
+###############################################################################
+#
+# Copyright 2010 Locomatix, Inc.
+# 
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+# 
+#     http://www.apache.org/licenses/LICENSE-2.0
+# 
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+###############################################################################
+import io
+import json
+import unittest
+from locomatix.stream import ResultStream
+
+# strings with escapes, surrogate pairs and multi-byte characters, numbers of
+# every shape and nested values, in the rows and around them
+BODY = u'''{"Status": "Success", "ExecutionTime": 0.25,
+  "Result": {"NextKey": "k\\"ey\\\\1", "Count": -12,
+    "Objects": [
+      {"Feed": "caf\u00e9", "ObjectID": "\\u00e9t\\u00e9 \\ud83d\\ude00",
+       "Latitude": 37.4195, "Longitude": -122.0845, "Time": 1300000000,
+       "NameValues": [{"Name": "tab\\there", "Value": "\u65e5\u672c"}]},
+      {"Feed": "cars", "ObjectID": "", "Latitude": 0, "Longitude": 1e-3,
+       "Time": -1.5E+2, "Nested": {"a": [1, [2.5, {"b": null}], true, false], "c": {}}},
+      [], {}, 7, "plain", null
+    ],
+    "Extra": [{"x": [0.125, -0]}, "\\/"]}}'''.encode('utf-8')
+
+def parse(body, chunk_size):
+  rows = []
+  stream = ResultStream(io.BytesIO(body), chunk_size)
+  data = stream.parse(rows.append)
+  return stream, data, rows
+
+class ChunkBoundaryTest(unittest.TestCase):
+  def test_every_chunk_size_gives_the_same_result(self):
+    expected = json.loads(BODY.decode('utf-8'))
+    expected_rows = expected['Result'].pop('Objects')
+    for chunk_size in range(1, len(BODY) + 1):
+      stream, data, rows = parse(BODY, chunk_size)
+      self.assertEqual(data, expected, "chunk size %d" % chunk_size)
+      self.assertEqual(rows, expected_rows, "chunk size %d" % chunk_size)
+      self.assertEqual(stream.rows, len(expected_rows))
+      self.assertEqual(stream.size, len(BODY))
+
+  def test_numbers_split_across_chunks_are_read_whole(self):
+    for number in (u'1', u'-0.5', u'12345.678e-12', u'6E+23'):
+      body = (u'{"Result": {"Objects": [%s, %s]}, "N": %s}' % (number, number, number)).encode('utf-8')
+      for chunk_size in range(1, len(body) + 1):
+        stream, data, rows = parse(body, chunk_size)
+        self.assertEqual(rows, [json.loads(number)] * 2, "%s in chunks of %d" % (number, chunk_size))
+        self.assertEqual(data, { 'Result': {}, 'N': json.loads(number) })
+
+  def test_result_without_objects(self):
+    for body in (u'{"Status": "Success", "Result": {"Objects": []}}', \
+                 u'{"Status": "Success", "Result": {"Count": 0}}', \
+                 u'{"Status": "Success", "Result": null}', \
+                 u'{}'):
+      expected = json.loads(body)
+      if isinstance(expected.get('Result'), dict):
+        expected['Result'].pop('Objects', None)
+      for chunk_size in (1, 2, 3, 1024):
+        stream, data, rows = parse(body.encode('utf-8'), chunk_size)
+        self.assertEqual(data, expected)
+        self.assertEqual(rows, [])
+
+class BadInputTest(unittest.TestCase):
+  def test_every_truncated_body_is_an_error(self):
+    for end in range(len(BODY)):
+      for chunk_size in (1, 7, 1024):
+        self.assertRaises(ValueError, parse, BODY[:end], chunk_size)
+
+  def test_malformed_bodies_are_errors(self):
+    for body in (u'{"Result": {"Objects": [1 2]}}', \
+                 u'{"Result": {"Objects": [1,]}}', \
+                 u'{"Result" {"Objects": []}}', \
+                 u'{"Status": "Success",}', \
+                 u'{"Status": "Success"} trailing', \
+                 u'{"Status": "Success"}{}', \
+                 u'{"Status": tru}', \
+                 u'{"Status": "unterminated}', \
+                 u'{"Status": "bad \\q escape"}', \
+                 u'["Result"]', \
+                 u''):
+      for chunk_size in (1, 3, 1024):
+        self.assertRaises(ValueError, parse, body.encode('utf-8'), chunk_size)
+
+  def test_invalid_utf8_is_an_error(self):
+    self.assertRaises(ValueError, parse, b'{"Status": "\xff"}', 4)
+
+if __name__ == '__main__':
+  unittest.main()